@@ -0,0 +1,151 @@
+import math
+import numpy as np
+from Broadphase import expandRanges
+
+# Returns the Morton code of every integer cell coordinate, with the bits of each axis interleaved from the first axis to the last
+# Sorting by the code puts every cell of the tree right after its parent so the cells of each node are contiguous
+def mortonCodes(coords, depth):
+    dim = coords.shape[1]
+    codes = np.zeros(len(coords), dtype=np.int64)
+    for bit in range(depth):
+        for axis in range(dim):
+            codes |= ((coords[:, axis] >> bit) & 1) << (bit * dim + dim - 1 - axis)
+    return codes
+
+
+
+
+
+class BarnesHut:
+    # Long range forces change slowly so they are applied once per step instead of every substep
+    substep = False
+
+    # Initialize a long range force between every pair of particles that falls off with the square of their distance
+    # strength is G for gravity (particles attract) or a negative constant for charges that repel, with charge equal to mass
+    # Distant groups of particles are treated as one particle at their center of mass when their cell is smaller than theta
+    # times their distance, and softening keeps the force finite at short range (the smallest radius when None)
+    # The quadtree (2D) or octree (3D) is rebuilt every step and cells are split until they hold at most leaf_size particles
+    # (or are max_depth levels deep), and to bound the memory used the tree is walked by batch nearby particles at a time
+    # and the pulls inside open leaves are summed chunk pairs at a time
+    def __init__(self, strength=1, theta=0.5, softening=None, leaf_size=8, max_depth=16, batch=4096, chunk=1 << 18):
+        self.strength = strength
+        self.theta = theta
+        self.softening = softening
+        self.leaf_size = leaf_size
+        self.max_depth = max_depth
+        self.batch = batch
+        self.chunk = chunk
+
+    # Builds the tree of a set of particles in bulk, level by level from the sorted Morton codes of the particles
+    # Only the cells with more than leaf_size particles are split at the next level, so crowded regions get deep cells and sparse ones stay shallow
+    # Each level keeps the key, first particle, particle count, mass, center of mass, and children of every cell (leaves have no children)
+    def build(self, pos, mass, box):
+        count, dim = pos.shape
+        # The codes of the deepest cells have to fit in an int64
+        self.code_depth = depth = max(1, min(self.max_depth, 62 // dim))
+        self.box = np.asarray(box, dtype=np.float64)
+        self.dim = dim
+        cells = 1 << depth
+        coords = np.clip((pos / self.box * cells).astype(np.int64), 0, cells - 1)
+        codes = mortonCodes(coords, depth)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes
+        sorted_codes = codes[self.order]
+        sorted_mass = mass[self.order]
+        sorted_moment = pos[self.order] * sorted_mass[:, None]
+
+        self.levels = []
+        # The sorted positions of the particles in the cells of the current level, which are contiguous runs for each cell
+        idx = np.arange(count)
+        for level in range(depth + 1):
+            keys = sorted_codes[idx] >> (dim * (depth - level))
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            counts = np.diff(np.append(starts, len(idx)))
+            node_mass = np.add.reduceat(sorted_mass[idx], starts)
+            center = np.add.reduceat(sorted_moment[idx], starts) / node_mass[:, None]
+            self.levels.append({"keys": keys[starts], "starts": idx[starts], "counts": counts,
+                                "mass": node_mass, "center": center, "width": float((self.box / (1 << level)).max())})
+            split = counts > self.leaf_size
+            if not split.any():
+                break
+            idx = idx[np.repeat(split, counts)]
+        self.tree_depth = len(self.levels) - 1
+        # The children of each cell are the cells one level down whose keys start with its key
+        for level, node in enumerate(self.levels):
+            if level == self.tree_depth:
+                node["first_child"] = np.zeros(len(node["keys"]), dtype=np.int64)
+                node["children"] = np.zeros(len(node["keys"]), dtype=np.int64)
+                continue
+            parents = self.levels[level + 1]["keys"] >> dim
+            node["first_child"] = np.searchsorted(parents, node["keys"], "left")
+            node["children"] = np.searchsorted(parents, node["keys"], "right") - node["first_child"]
+
+    # Returns the acceleration of every particle of a world from all of the others
+    def accelerations(self, world):
+        pos, mass = world.pos, world.mass
+        count, dim = pos.shape
+        acc = np.zeros((count, dim))
+        if count < 2 or self.strength == 0:
+            return acc
+        softening = float(world.radius.min()) if self.softening is None else self.softening
+        self.build(pos, mass, world.box)
+        # Particles next to each other in the sorted order are close together so they open mostly the same cells
+        for first in range(0, count, self.batch):
+            group = self.order[first:first + self.batch]
+            acc[group] = self.walk(pos, mass, group, softening)
+        return acc
+
+    # Returns the accelerations of the particles group from every particle
+    # The particles walk down the tree at the same time one level per pass, taking the pull of cells that are far enough
+    # away as a whole and opening the rest, and pulls from the particles in the leaves that are still open are summed directly
+    def walk(self, pos, mass, group, softening):
+        dim = pos.shape[1]
+        acc = np.zeros((len(group), dim))
+        # Pairs of a particle (by its index in group) and a cell it still has to be pulled by, starting from the root
+        p = np.arange(len(group))
+        n = np.zeros(len(group), dtype=np.int64)
+        codes = self.codes[group]
+        # The particles and the ranges of sorted particles of the open leaves they have to sum directly
+        leaf_p, leaf_starts, leaf_counts = [], [], []
+        for level, node in enumerate(self.levels):
+            diff = node["center"][n] - pos[group[p]]
+            dist_sq = np.einsum("ij,ij->i", diff, diff)
+            # A cell can only be taken as a whole when the particle is not inside it and it looks small enough
+            inside = (codes[p] >> (dim * (self.code_depth - level))) == node["keys"][n]
+            far = ~inside & (node["width"] ** 2 < self.theta ** 2 * dist_sq)
+            self.pull(acc, p[far], diff[far], dist_sq[far], node["mass"][n[far]], softening)
+            p, n = p[~far], n[~far]
+            children = node["children"][n]
+            leaf = children == 0
+            leaf_p.append(p[leaf])
+            leaf_starts.append(node["starts"][n[leaf]])
+            leaf_counts.append(node["counts"][n[leaf]])
+            p, n, children = p[~leaf], n[~leaf], children[~leaf]
+            p = np.repeat(p, children)
+            n = expandRanges(node["first_child"][n], children)
+        self.pullLeaves(acc, pos, mass, group, np.concatenate(leaf_p), np.concatenate(leaf_starts), np.concatenate(leaf_counts), softening)
+        return acc
+
+    # Sums the pulls of the particles in the leaf ranges of sorted particles starts[k] to starts[k] + counts[k] on particle group[p[k]] directly
+    # The ranges are expanded into pairs about chunk pairs at a time so crowded leaves never need every pair in memory at once
+    def pullLeaves(self, acc, pos, mass, group, p, starts, counts, softening):
+        if len(p) == 0:
+            return
+        ends = np.cumsum(counts)
+        cuts = np.searchsorted(ends, np.arange(self.chunk, ends[-1], self.chunk), "right")
+        bounds = np.unique(np.concatenate(([0], cuts, [len(p)])))
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            q = self.order[expandRanges(starts[first:last], counts[first:last])]
+            target = np.repeat(p[first:last], counts[first:last])
+            other = group[target] != q
+            target, q = target[other], q[other]
+            diff = pos[q] - pos[group[target]]
+            self.pull(acc, target, diff, np.einsum("ij,ij->i", diff, diff), mass[q], softening)
+
+    # Adds the pull of masses at offsets diff (with squared distances dist_sq) to the accelerations of particles p
+    def pull(self, acc, p, diff, dist_sq, mass, softening):
+        if len(p) == 0:
+            return
+        scale = self.strength * mass / (dist_sq + softening ** 2) ** 1.5
+        for axis in range(acc.shape[1]):
+            acc[:, axis] += np.bincount(p, diff[:, axis] * scale, minlength=len(acc))
@@ -0,0 +1,270 @@
+import itertools, math
+import numpy as np
+
+# Returns a flat array of indices of the form starts[k] + 0, 1, ..., counts[k] - 1 for every k
+def expandRanges(starts, counts):
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+# Returns the offsets of the half neighbourhood stencil (all offsets lexicographically after zero)
+# so that every pair of neighbouring cells is visited exactly once
+def halfStencil(reach):
+    ranges = [range(-r, r + 1) for r in reach]
+    zero = tuple(0 for _ in reach)
+    return [o for o in itertools.product(*ranges) if o > zero]
+
+# Returns the indices of the particles (out of candidates, or all of them) whose centers are within radius of center
+def withinRadius(pos, center, radius, candidates=None):
+    if candidates is None:
+        candidates = np.arange(len(pos))
+    diff = pos[candidates] - np.asarray(center, dtype=np.float64)
+    return candidates[np.einsum("ij,ij->i", diff, diff) < radius ** 2]
+
+# Returns the indices of the particles (out of candidates, or all of them) whose centers are inside the box from low to high
+def withinBox(pos, low, high, candidates=None):
+    if candidates is None:
+        candidates = np.arange(len(pos))
+    inside = (pos[candidates] >= np.asarray(low, dtype=np.float64)) & (pos[candidates] <= np.asarray(high, dtype=np.float64))
+    return candidates[np.all(inside, axis=1)]
+
+
+
+
+
+class CellGrid:
+    # Initialize a uniform grid of cells over the box with the given number of cells along each axis
+    def __init__(self, box, cells):
+        self.box = np.asarray(box, dtype=np.float64)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.size = self.box / self.cells
+        self.dim = len(self.cells)
+        # Strides to flatten a cell coordinate into a single cell index (the first axis varies slowest)
+        self.strides = np.ones(self.dim, dtype=np.int64)
+        for axis in range(self.dim - 2, -1, -1):
+            self.strides[axis] = self.strides[axis + 1] * self.cells[axis + 1]
+        self.count = int(np.prod(self.cells))
+        self.stencils = {}
+        self.order = None
+        self.starts = None
+        self.counts = None
+        self.coords = None
+        self.keys = None
+
+    # Creates a grid with cells that are at least size wide along each axis
+    @classmethod
+    def sized(cls, box, size):
+        box = np.asarray(box, dtype=np.float64)
+        return cls(box, np.maximum(1, (box // size).astype(np.int64)))
+
+    # Returns the number of cells to search along each axis for particles of the given maximum radius
+    def reach(self, max_radius):
+        return tuple(max(1, math.ceil(2 * max_radius / s)) for s in self.size)
+
+    # Returns the cached half neighbourhood stencil for a reach
+    def stencil(self, reach):
+        if reach not in self.stencils:
+            self.stencils[reach] = np.array(halfStencil(reach), dtype=np.int64).reshape(-1, self.dim)
+        return self.stencils[reach]
+
+    # Bins every particle into its cell with a counting sort on the flattened cell index
+    def bin(self, pos):
+        self.coords = np.clip((pos // self.size).astype(np.int64), 0, self.cells - 1)
+        self.keys = self.coords @ self.strides
+        self.counts = np.bincount(self.keys, minlength=self.count)
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.order = np.argsort(self.keys, kind="stable")
+
+    # Returns the indices of the particles in a cell given its flattened index
+    def cell(self, key):
+        return self.order[self.starts[key]:self.starts[key] + self.counts[key]]
+
+    # Returns the indices of the particles binned into the cells that overlap the box from low to high
+    # drift is the farthest particles may have moved since they were binned (collisions push them after the last substep),
+    # and the cells that far around the box are searched as well
+    def region(self, pos, low, high, drift=0):
+        if self.keys is None or len(self.keys) != len(pos):
+            self.bin(pos)
+        first = np.clip(np.floor((np.asarray(low) - drift) / self.size).astype(np.int64), 0, self.cells - 1)
+        last = np.clip(np.floor((np.asarray(high) + drift) / self.size).astype(np.int64), 0, self.cells - 1)
+        if np.any(last < first):
+            return np.empty(0, dtype=np.int64)
+        axes = np.meshgrid(*[np.arange(f, l + 1) for f, l in zip(first, last)], indexing="ij")
+        keys = sum(axis * stride for axis, stride in zip(axes, self.strides)).ravel()
+        return self.order[expandRanges(self.starts[keys], self.counts[keys])]
+
+    # Returns the indices of the particles whose centers are within radius of center, only looking through the cells around it
+    def queryRadius(self, pos, center, radius, drift=0):
+        center = np.asarray(center, dtype=np.float64)
+        return withinRadius(pos, center, radius, self.region(pos, center - radius, center + radius, drift))
+
+    # Returns the indices of the particles whose centers are inside the box from low to high, only looking through the cells it overlaps
+    def queryBox(self, pos, low, high, drift=0):
+        return withinBox(pos, low, high, self.region(pos, low, high, drift))
+
+    # Returns the unique candidate pairs of particles in the same or neighbouring cells as two index arrays
+    # distance is the largest separation between the centers of a pair that should be found (twice the largest radius by default)
+    def pairs(self, pos, radius, distance=None):
+        if distance is None:
+            distance = 2 * float(radius.max())
+        self.bin(pos)
+        n = len(pos)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # Work on particles in sorted order so every cell is a contiguous block
+        keys = self.keys[self.order]
+        coords = self.coords[self.order]
+        rank = np.arange(n)
+        first = []
+        second = []
+
+        # Pairs within the same cell, each particle paired with the ones after it in its cell
+        ends = self.starts[keys] + self.counts[keys]
+        counts = ends - rank - 1
+        first.append(np.repeat(rank, counts))
+        second.append(expandRanges(rank + 1, counts))
+
+        # Pairs with the neighbouring cells in the half stencil
+        for offset in self.stencil(self.reach(distance / 2)):
+            neighbour = coords + offset
+            valid = np.all((neighbour >= 0) & (neighbour < self.cells), axis=1)
+            source = rank[valid]
+            nkeys = neighbour[valid] @ self.strides
+            counts = self.counts[nkeys]
+            first.append(np.repeat(source, counts))
+            second.append(expandRanges(self.starts[nkeys], counts))
+
+        return self.order[np.concatenate(first)], self.order[np.concatenate(second)]
+
+
+
+
+
+class SweepAndPrune:
+    # Initialize a sweep and prune broad phase that sorts particles along one axis
+    # The axis with the largest spread is picked every step unless a fixed axis is given
+    def __init__(self, axis=None):
+        self.axis = axis
+        self.sweep_axis = None
+        self.order = None
+
+    # Returns the axis to sweep along for the current positions
+    def pickAxis(self, pos):
+        if self.axis is not None:
+            return self.axis
+        return int(np.argmax(pos.var(axis=0)))
+
+    # Sorts the particles by the low end of their intervals along the sweep axis
+    # The order from the last step is reused so the nearly sorted input is re-sorted in close to linear time
+    def sort(self, low):
+        if self.order is None or len(self.order) != len(low):
+            self.order = np.argsort(low, kind="stable")
+        else:
+            self.order = self.order[np.argsort(low[self.order], kind="stable")]
+        return self.order
+
+    # Returns the unique candidate pairs of particles whose bounding boxes overlap as two index arrays
+    def pairs(self, pos, radius):
+        axis = self.pickAxis(pos)
+        if axis != self.sweep_axis:
+            self.sweep_axis = axis
+            self.order = None
+        coord = pos[:, axis]
+        order = self.sort(coord - radius)
+
+        # Every particle overlaps the ones after it in sorted order until their intervals stop overlapping
+        low = (coord - radius)[order]
+        high = (coord + radius)[order]
+        rank = np.arange(len(order))
+        counts = np.searchsorted(low, high, side="right") - rank - 1
+        counts = np.maximum(counts, 0)
+        first = np.repeat(rank, counts)
+        second = expandRanges(rank + 1, counts)
+        i = order[first]
+        j = order[second]
+
+        # Prune the pairs whose intervals do not overlap on the other axes
+        keep = np.ones(len(i), dtype=bool)
+        reach = radius[i] + radius[j]
+        for other in range(pos.shape[1]):
+            if other != axis:
+                keep &= np.abs(pos[i, other] - pos[j, other]) <= reach
+        return i[keep], j[keep]
+
+
+
+
+
+class NeighbourList:
+    # Initialize a Verlet neighbour list of the pairs of particles whose centers are closer than their cutoff plus a skin distance
+    # The cutoff of a pair is factor times the sum of their radii
+    # The list is only rebuilt once the two particles that moved furthest since the last build have moved more than the skin between them,
+    # because until then no pair that was left out can have come within its cutoff
+    # Without a fixed skin it is sized at every build from how far the fastest particle moved per use of the last list so the list
+    # lasts about lifetime uses (but never less than a tenth of the largest radius), starting from the largest radius
+    # Hot particles can move most of a radius per use, so the skin is capped at the largest diameter: searching that much further
+    # costs less than the grid searches it saves in dilute gases, and the list still lasts two or three uses instead of one
+    def __init__(self, factor=1, skin=None, lifetime=3):
+        self.factor = factor
+        self.skin = skin
+        self.adaptive = skin is None
+        self.lifetime = lifetime
+        self.grid = None
+        self.reference = None
+        self.moved = 0.0
+        self.uses = 0
+        self.i = np.empty(0, dtype=np.int64)
+        self.j = np.empty(0, dtype=np.int64)
+        self.builds = 0
+
+    # Returns whether the two particles that moved furthest since the last build have moved more than the skin together
+    # (or the particles changed), since no other pair can have closed the gap by more
+    def stale(self, pos):
+        if self.reference is None or self.reference.shape != pos.shape:
+            return True
+        moved = pos - self.reference
+        moved = np.einsum("ij,ij->i", moved, moved)
+        if len(moved) < 2:
+            return False
+        second, first = np.sqrt(np.partition(moved, len(moved) - 2)[-2:])
+        self.moved = float(first)
+        return first + second > self.skin
+
+    # Finds every pair within its cutoff plus the skin with a grid of cells as wide as the largest of those distances
+    def build(self, pos, radius, box):
+        largest = float(radius.max())
+        cutoff = self.factor * 2 * largest
+        if self.adaptive:
+            skin = 2 * self.lifetime * self.moved / self.uses if self.uses else largest
+            self.skin = max(0.1 * largest, min(skin, 2 * largest))
+        distance = cutoff + self.skin
+        box = np.asarray(box, dtype=np.float64)
+        if self.grid is None or not np.array_equal(self.grid.box, box) or not np.array_equal(self.grid.cells, np.maximum(1, box // distance)):
+            self.grid = CellGrid.sized(box, distance)
+        i, j = self.grid.pairs(pos, radius, distance)
+        diff = pos[j] - pos[i]
+        keep = np.einsum("ij,ij->i", diff, diff) < (self.factor * (radius[i] + radius[j]) + self.skin) ** 2
+        self.i, self.j = i[keep], j[keep]
+        self.reference = pos.copy()
+        self.moved = 0.0
+        self.uses = 0
+        self.builds += 1
+
+    # Returns the cached pairs as two index arrays, rebuilding them first if they may be missing a pair
+    def pairs(self, pos, radius, box):
+        if self.stale(pos):
+            self.build(pos, radius, box)
+        self.uses += 1
+        return self.i, self.j
+
+
+# Creates the broad phase called name ("grid" or "sweep") for a box split into the given number of cells
+def makeBroadphase(name, box, cells):
+    if name == "sweep":
+        return SweepAndPrune()
+    if name == "grid":
+        return CellGrid(box, cells)
+    raise ValueError(f"Unknown broad phase: {name}")
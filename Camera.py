@@ -0,0 +1,86 @@
+import numpy as np
+import pygame
+from Vector import Vector3, Quaternion
+
+# Pairs of box corners joined by an edge, where corner i is on the high side of the x, y, and z axes when bit 2, 1, and 0 are set
+EDGES = [(i, i | 1 << b) for i in range(8) for b in (2, 1, 0) if not i & 1 << b]
+
+class Camera:
+    # Initialize a camera looking down the z axis at a box from a distance, drawn zoomed and offset on the screen
+    # The view is kept as a quaternion orientation and the rotation, view matrix, and projected box edges
+    # are cached until the orientation changes
+    def __init__(self, box, distance=800, zoom=0.9, offset=(400, 400)):
+        self.box = np.asarray(box, dtype=np.float64)
+        self.distance = distance
+        self.zoom = zoom
+        self.offset = np.asarray(offset, dtype=np.float64)
+        bits = np.array([[i >> 2 & 1, i >> 1 & 1, i & 1] for i in range(8)])
+        self.corners = (bits - 0.5) * self.box
+        self.orientation = Quaternion(1, 0, 0, 0)
+        self.angles = (0, 0)
+        self.dirty = True
+
+    # Points the camera by rotating by y_angle about the y axis and then by x_angle about the x axis
+    # Nothing needs to be recomputed when the angles are the same as last time
+    def setAngles(self, x_angle, y_angle):
+        if (x_angle, y_angle) == self.angles:
+            return
+        self.angles = (x_angle, y_angle)
+        self.setOrientation(Quaternion.make(Vector3(1, 0, 0), x_angle) * Quaternion.make(Vector3(0, 1, 0), y_angle))
+
+    # Sets the orientation of the camera to a quaternion
+    def setOrientation(self, orientation):
+        self.orientation = orientation.normalized()
+        self.dirty = True
+
+    # Recomputes everything that depends on the orientation if it changed since the last time
+    def update(self):
+        if not self.dirty:
+            return
+        self.rot = self.orientation.toMatrix()
+        self.view = self.viewMatrix()
+        self.edges = self.boxEdges()
+        self.dirty = False
+
+    # Returns the matrix that centers, rotates, and projects homogeneous positions (x, y, z, 1) in one multiplication
+    # Dividing the first two rows of the result by the last row gives the screen x and y, the third row is the depth,
+    # and the last row is how much the projection shrinks things at that depth
+    def viewMatrix(self):
+        view = np.zeros((4, 4))
+        view[:3, :3] = self.rot.array()
+        # Center the box on the origin before rotating it
+        view[:3, 3] = -view[:3, :3] @ (self.box / 2)
+        # The projection divisor is (distance - z) / distance for the rotated z
+        w = -view[2] / self.distance
+        w[3] += 1
+        # Scale and offset x and y, multiplying the offset by the divisor so it is unchanged by the divide
+        view[0] = self.zoom * view[0] + self.offset[0] * w
+        view[1] = self.zoom * view[1] + self.offset[1] * w
+        view[3] = w
+        return view
+
+    # Returns the screen x and y, the depth, and the size scale of every position after rotation and projection
+    def project(self, pos):
+        self.update()
+        projected = pos @ self.view[:, :3].T + self.view[:, 3]
+        scale = 1 / projected[:, 3]
+        return projected[:, 0] * scale, projected[:, 1] * scale, projected[:, 2], scale
+
+    # Returns the start, end, and color on the screen of each of the 12 box edges, shaded lighter towards the viewer
+    def boxEdges(self):
+        rotated = self.rot.apply(self.corners)
+        scale = self.distance / (self.distance - rotated[:, 2])
+        screen = self.zoom * rotated[:, :2] * scale[:, None] + self.offset
+        edges = []
+        for i, j in EDGES:
+            lum = ((rotated[i, 2] + rotated[j, 2]) / 400 + 1) * 30
+            color = pygame.Color(255, 255, 255)
+            color.hsla = (0, 0, max(30, min(100, lum)), 100)
+            edges.append((screen[i].tolist(), screen[j].tolist(), color))
+        return edges
+
+    # Draws the edges of the box
+    def drawBox(self, screen):
+        self.update()
+        for start, end, color in self.edges:
+            pygame.draw.line(screen, color, start, end, 2)
@@ -0,0 +1,106 @@
+import json, struct
+import numpy as np
+from World import World
+from History import History
+
+# Checkpoint files start with these bytes followed by the length of a JSON header and then the raw arrays
+MAGIC = b"PSIMCKPT"
+VERSION = 1
+# Arrays start on 64 byte boundaries so they can be memory mapped and used without copying
+ALIGN = 64
+
+# Returns the offset rounded up to the next multiple of ALIGN
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+# Saves the full state of a world (and optionally its kinetic energy history) to a binary checkpoint file
+# Works with any engine that has position, velocity, mass, and radius arrays, a box, and a friction value
+def saveCheckpoint(world, path, history=None):
+    arrays = {
+        "pos": np.ascontiguousarray(world.pos, dtype=np.float64),
+        "vel": np.ascontiguousarray(world.vel, dtype=np.float64),
+        "mass": np.ascontiguousarray(world.mass, dtype=np.float64),
+        "radius": np.ascontiguousarray(world.radius, dtype=np.float64),
+        "box": np.ascontiguousarray(world.box, dtype=np.float64),
+    }
+    header = {
+        "version": VERSION,
+        "friction": world.friction,
+        "steps": getattr(world, "steps", 0),
+        "total_ke": world.totalKE(),
+        "cfl": getattr(world, "cfl", 1),
+        "max_substeps": getattr(world, "max_substeps", 64),
+        "resync": getattr(world, "resync", 100),
+        "rng": world.rng.bit_generator.state if getattr(world, "rng", None) is not None else None,
+        "history": None,
+    }
+    if history is not None:
+        header["history"] = {"size": len(history.tiers[0].data), "tiers": len(history.tiers) - 1, "factor": history.factor}
+        for tier in range(len(history.tiers)):
+            arrays[f"history{tier}"] = history.values(tier)
+
+    # Lay out the arrays one after another at aligned offsets from the start of the data
+    offset = 0
+    header["arrays"] = {}
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = aligned(offset + array.nbytes)
+    text = json.dumps(header).encode()
+    start = aligned(len(MAGIC) + 8 + len(text))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(text)))
+        f.write(text)
+        for name, array in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+
+# Reads the header of a checkpoint file and memory maps its arrays without copying them
+# mode is "r" for read only arrays or "c" for arrays that can be changed in memory without changing the file
+def readCheckpoint(path, mode="r"):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file")
+        length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header["version"] != VERSION:
+        raise ValueError(f"{path} has checkpoint version {header['version']} but only version {VERSION} is supported")
+    start = aligned(len(MAGIC) + 8 + length)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        shape = tuple(info["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=info["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=info["dtype"], mode=mode, offset=start + info["offset"], shape=shape)
+    return header, arrays
+
+# Restores a World and its kinetic energy history (or None if it was not saved) from a checkpoint file
+# With mmap the particle arrays stay memory mapped (copy on write) instead of being read into memory up front
+def loadCheckpoint(path, mmap=False, broadphase=None):
+    header, arrays = readCheckpoint(path, "c")
+    if not mmap:
+        arrays = {name: np.array(array) for name, array in arrays.items()}
+    # The radii are restored exactly but the world is made with the same radius to mass ratio so its default grid is sized the same
+    radius_factor = float(arrays["radius"][0] / arrays["mass"][0]) if len(arrays["mass"]) else 1
+    world = World(arrays["mass"], arrays["pos"], arrays["vel"], arrays["box"], header["friction"], radius_factor, broadphase,
+                  header["cfl"], header["max_substeps"], header["resync"])
+    world.radius = arrays["radius"]
+    world.steps = header["steps"]
+    # The running total is restored as it was so a resumed run matches one that never stopped
+    world.total_ke = header["total_ke"]
+    if header["rng"] is not None:
+        bit_generator = getattr(np.random, header["rng"]["bit_generator"])()
+        bit_generator.state = header["rng"]
+        world.rng = np.random.Generator(bit_generator)
+
+    history = None
+    if header["history"] is not None:
+        info = header["history"]
+        history = History(info["size"], info["tiers"], info["factor"])
+        for tier, buffer in enumerate(history.tiers):
+            for value in arrays[f"history{tier}"].tolist():
+                buffer.append(value)
+    return world, history
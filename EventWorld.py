@@ -0,0 +1,274 @@
+import heapq, math
+import numpy as np
+
+# Kinds of events in the event queue
+PAIR = 0
+WALL = 1
+CELL = 2
+
+class EventWorld:
+    # Initialize an event driven world of hard spheres with masses, positions, and velocities inside a box
+    # Instead of moving by a fixed step, exact collision times are predicted and processed in order from a priority queue
+    # The total kinetic energy is kept up to date from the changes made by each event and is recomputed from scratch every resync steps
+    def __init__(self, mass, pos, vel, box, friction=1, radius_factor=1/3, resync=100):
+        self.pos = np.array(pos, dtype=np.float64)
+        self.vel = np.array(vel, dtype=np.float64)
+        self.mass = np.ascontiguousarray(np.broadcast_to(mass, len(self.pos)), dtype=np.float64)
+        self.radius = self.mass * radius_factor
+        self.box = np.asarray(box, dtype=np.float64)
+        self.friction = friction
+        self.dim = self.pos.shape[1]
+        # Cells are at least as wide as the largest particle so only neighbouring cells can collide
+        self.cells = np.maximum(1, (self.box // (2 * self.radius.max())).astype(np.int64)).tolist()
+        self.size = (self.box / self.cells).tolist()
+        self.time = 0.0
+        self.collisions = 0
+        self.events = 0
+        self.resync = resync
+        self.steps = 0
+        self.recomputeKE()
+        self.reset()
+
+    # Creates an event driven world with the same particles as an array based World
+    @classmethod
+    def fromWorld(cls, world):
+        return cls(world.mass, world.pos, world.vel, world.box, world.friction, world.radius / world.mass)
+
+    # Returns the number of particles in the world
+    def __len__(self):
+        return len(self.pos)
+
+    # Get the momentum of every particle based on its mass and velocity
+    def mom(self):
+        return self.vel * self.mass[:, None]
+
+    # Get the kinetic energy of every particle based on its mass and velocity
+    def ke(self):
+        return 0.5 * self.mass * np.einsum("ij,ij->i", self.vel, self.vel)
+
+    # Get the total kinetic energy of the system
+    def totalKE(self):
+        return self.total_ke
+
+    # Recomputes the total kinetic energy from every particle to correct drift in the running total
+    def recomputeKE(self):
+        self.total_ke = float(self.ke().sum())
+        return self.total_ke
+
+    # Adds a change in kinetic energy made from outside the world (for example by heating) to the running total
+    def addKE(self, change):
+        self.total_ke += change
+
+    # Rebuilds the cells and the event queue from the position and velocity arrays
+    def reset(self):
+        self.P = self.pos.tolist()
+        self.V = self.vel.tolist()
+        self.M = self.mass.tolist()
+        self.R = self.radius.tolist()
+        self.B = self.box.tolist()
+        self.T = [self.time] * len(self.P)
+        # The number of events each particle has been in, events predicted with an older count are stale
+        self.count = [0] * len(self.P)
+        self.zone = [self.cellOf(p) for p in self.P]
+        self.grid = {}
+        self.around = {}
+        for i, zone in enumerate(self.zone):
+            self.grid.setdefault(zone, set()).add(i)
+        self.queue = []
+        self.seq = 0
+        for i in range(len(self.P)):
+            self.predict(i)
+        self.synced_pos = self.pos.copy()
+        self.synced_vel = self.vel.copy()
+
+    # Returns the cell containing a position
+    def cellOf(self, p):
+        return tuple(min(c - 1, max(0, int(x // s))) for x, s, c in zip(p, self.size, self.cells))
+
+    # Returns the sets of particles in the cells around a cell, which are cached since they are needed for every prediction
+    def neighbours(self, zone):
+        if zone not in self.around:
+            ranges = [range(max(0, z - 1), min(c, z + 2)) for z, c in zip(zone, self.cells)]
+            self.around[zone] = [self.grid.setdefault(cell, set()) for cell in self.product(ranges)]
+        return self.around[zone]
+
+    # Returns every combination of one value from each range as tuples
+    def product(self, ranges):
+        cells = [()]
+        for r in ranges:
+            cells = [cell + (v,) for cell in cells for v in r]
+        return cells
+
+    # Moves particle i forward in time to the current time
+    def sync(self, i):
+        dt = self.time - self.T[i]
+        if dt:
+            self.P[i] = [x + v * dt for x, v in zip(self.P[i], self.V[i])]
+            self.T[i] = self.time
+
+    # Adds an event to the queue
+    def push(self, time, kind, i, j):
+        cj = self.count[j] if kind == PAIR else 0
+        heapq.heappush(self.queue, (time, self.seq, kind, i, j, self.count[i], cj))
+        self.seq += 1
+
+    # Returns the time until particles i and j touch or None if they never do
+    def pairTime(self, i, j):
+        dtj = self.time - self.T[j]
+        pi, vi = self.P[i], self.V[i]
+        dr = [x + v * dtj - y for x, v, y in zip(self.P[j], self.V[j], pi)]
+        dv = [v - w for v, w in zip(self.V[j], vi)]
+        b = sum(r * v for r, v in zip(dr, dv))
+        # The particles have to be approaching each other to collide
+        if b >= 0:
+            return None
+        dv_sq = sum(v * v for v in dv)
+        dr_sq = sum(r * r for r in dr)
+        sigma = self.R[i] + self.R[j]
+        # Overlapping particles that are approaching collide right away
+        if dr_sq < sigma * sigma:
+            return 0.0
+        d = b * b - dv_sq * (dr_sq - sigma * sigma)
+        if d < 0:
+            return None
+        return -(b + math.sqrt(d)) / dv_sq
+
+    # Predicts the next collision, wall, and cell events for particle i at the current time
+    def predict(self, i):
+        self.sync(i)
+        p, v, r = self.P[i], self.V[i], self.R[i]
+        # Collisions with particles in the neighbouring cells
+        for cell in self.neighbours(self.zone[i]):
+            for j in cell:
+                if j != i:
+                    t = self.pairTime(i, j)
+                    if t is not None:
+                        self.push(self.time + t, PAIR, i, j)
+        for axis in range(self.dim):
+            if v[axis] > 0:
+                wall = (self.B[axis] - r - p[axis]) / v[axis]
+                edge = ((self.zone[i][axis] + 1) * self.size[axis] - p[axis]) / v[axis]
+            elif v[axis] < 0:
+                wall = (r - p[axis]) / v[axis]
+                edge = (self.zone[i][axis] * self.size[axis] - p[axis]) / v[axis]
+            else:
+                continue
+            # Collision with the wall the particle is moving towards
+            self.push(self.time + max(0.0, wall), WALL, i, axis)
+            # Crossing into the next cell unless the particle is in the last cell on this side
+            step = 1 if v[axis] > 0 else -1
+            if 0 <= self.zone[i][axis] + step < self.cells[axis]:
+                self.push(self.time + max(0.0, edge), CELL, i, axis)
+
+    # Handles an elastic collision between particles i and j with optional damping
+    def collide(self, i, j):
+        self.sync(i)
+        self.sync(j)
+        dr = [y - x for x, y in zip(self.P[i], self.P[j])]
+        dv = [w - v for v, w in zip(self.V[i], self.V[j])]
+        dr_sq = sum(r * r for r in dr)
+        mi, mj = self.M[i], self.M[j]
+        before = mi * sum(v * v for v in self.V[i]) + mj * sum(v * v for v in self.V[j])
+        if dr_sq > 0:
+            # Adjust both velocities along the line between the particles based on conservation of momentum
+            s = sum(r * v for r, v in zip(dr, dv)) / dr_sq
+            si = s * 2 * mj / (mi + mj)
+            sj = s * 2 * mi / (mi + mj)
+            self.V[i] = [v + r * si for v, r in zip(self.V[i], dr)]
+            self.V[j] = [v - r * sj for v, r in zip(self.V[j], dr)]
+        # Dampen particle velocities to simulate friction
+        self.V[i] = [v * self.friction for v in self.V[i]]
+        self.V[j] = [v * self.friction for v in self.V[j]]
+        after = mi * sum(v * v for v in self.V[i]) + mj * sum(v * v for v in self.V[j])
+        self.total_ke += 0.5 * (after - before)
+        self.collisions += 1
+
+    # Handles an elastic collision between particle i and the wall on an axis with optional damping
+    def bounce(self, i, axis):
+        self.sync(i)
+        v = self.V[i]
+        v[axis] *= -1
+        # Clamp the particle against the wall it hit to avoid drifting through it from rounding
+        r = self.R[i]
+        self.P[i][axis] = r if v[axis] > 0 else self.B[axis] - r
+        self.V[i] = [c * self.friction for c in v]
+        self.total_ke += 0.5 * self.M[i] * (self.friction ** 2 - 1) * sum(c * c for c in v)
+
+    # Moves particle i into the next cell along an axis
+    def cross(self, i, axis):
+        self.sync(i)
+        zone = list(self.zone[i])
+        zone[axis] += 1 if self.V[i][axis] > 0 else -1
+        zone = tuple(zone)
+        self.grid[self.zone[i]].discard(i)
+        self.grid.setdefault(zone, set()).add(i)
+        self.zone[i] = zone
+
+    # Processes every event up to dt time units in the future and moves all particles to that time
+    def advance(self, dt=1):
+        self.pickUpChanges()
+        end = self.time + dt
+        queue = self.queue
+        while queue and queue[0][0] <= end:
+            time, _, kind, i, j, ci, cj = heapq.heappop(queue)
+            # Skip events that were predicted before one of their particles changed course
+            if ci != self.count[i] or (kind == PAIR and cj != self.count[j]):
+                continue
+            self.time = max(self.time, time)
+            self.events += 1
+            if kind == PAIR:
+                self.collide(i, j)
+                self.count[i] += 1
+                self.count[j] += 1
+                self.predict(i)
+                self.predict(j)
+            else:
+                if kind == WALL:
+                    self.bounce(i, j)
+                else:
+                    self.cross(i, j)
+                self.count[i] += 1
+                self.predict(i)
+        self.time = end
+        self.compact()
+        self.publish()
+
+    # Advance the whole system by a time of dt (one frame of the original simulation when dt is 1)
+    # Collision times are exact so no substeps are needed no matter how fast the particles move
+    def step(self, dt=1):
+        self.advance(dt)
+        self.steps += 1
+        if self.resync and self.steps % self.resync == 0:
+            self.recomputeKE()
+
+    # Drops stale events once they make up most of the queue
+    def compact(self):
+        if len(self.queue) > 16 * len(self.P) + 1024:
+            self.queue = [e for e in self.queue if e[5] == self.count[e[3]] and (e[2] != PAIR or e[6] == self.count[e[4]])]
+            heapq.heapify(self.queue)
+
+    # Writes the particle state at the current time into the position and velocity arrays
+    def publish(self):
+        for i in range(len(self.P)):
+            self.sync(i)
+        self.pos[:] = self.P
+        self.vel[:] = self.V
+        self.synced_pos = self.pos.copy()
+        self.synced_vel = self.vel.copy()
+
+    # Re-predicts the events of particles whose position or velocity arrays were changed from outside
+    # (for example by heating or clicking) since the last frame
+    def pickUpChanges(self):
+        changed = np.nonzero(np.any(self.pos != self.synced_pos, axis=1) | np.any(self.vel != self.synced_vel, axis=1))[0]
+        for i in changed.tolist():
+            self.T[i] = self.time
+            self.P[i] = self.pos[i].tolist()
+            self.V[i] = self.vel[i].tolist()
+            zone = self.cellOf(self.P[i])
+            if zone != self.zone[i]:
+                self.grid[self.zone[i]].discard(i)
+                self.grid.setdefault(zone, set()).add(i)
+                self.zone[i] = zone
+            self.count[i] += 1
+        for i in changed.tolist():
+            self.predict(i)
@@ -0,0 +1,54 @@
+import numpy as np
+import pygame
+
+class Histogram:
+    # Initialize a histogram of particle speeds with one bin for each pixel column it is drawn in, each bin_width speed wide
+    # Bars are colored from hue_max in the first column down to red after hue_width columns, like the original distributions
+    # Speeds are only binned on every k-th update, and from a random sample of that many particles when sample is set
+    def __init__(self, bins, bin_width, hue_max, hue_width, every=1, sample=None, seed=None):
+        self.bins = bins
+        self.bin_width = bin_width
+        self.hue_max = hue_max
+        self.hue_width = hue_width
+        self.every = max(1, every)
+        self.sample = sample
+        self.rng = np.random.default_rng(seed)
+        self.updates = 0
+        self.fractions = np.zeros(bins)
+        # The color of every whole hue so the bars can be colored with one lookup
+        palette = []
+        for hue in range(361):
+            color = pygame.Color(255, 255, 255)
+            color.hsla = (hue, 100, 50, 100)
+            palette.append((color.r, color.g, color.b))
+        self.palette = np.array(palette, dtype=np.uint8)
+
+    # Bins the speeds of particles with velocities vel when an update is due and returns the fraction of particles in each bin
+    def update(self, vel):
+        if self.updates % self.every == 0:
+            if self.sample and self.sample < len(vel):
+                vel = vel[self.rng.integers(0, len(vel), self.sample)]
+            speed = np.sqrt(np.einsum("ij,ij->i", vel, vel))
+            # Speeds past the last column are left out of the bars but still count towards the total
+            idx = (speed // self.bin_width).astype(np.int64)
+            counts = np.bincount(idx[idx < self.bins], minlength=self.bins)
+            self.fractions = counts / max(1, len(vel))
+        self.updates += 1
+        return self.fractions
+
+    # Draws the bars with their bottom left corner at left, bottom and a height of height pixels per whole fraction
+    # Bars are cut off at max_height pixels and scale stretches the colors along with the bars
+    def draw(self, screen, left, bottom, height, max_height, scale=1):
+        bars = np.minimum(max_height, (height * self.fractions).astype(np.int64))
+        columns = np.arange(self.bins)
+        hues = np.maximum(0, self.hue_max - (scale * self.hue_max * columns // self.hue_width)).astype(np.int64)
+        colors = self.palette[hues]
+
+        # Write every bar into the screen's pixels at once
+        pixels = pygame.surfarray.pixels3d(screen)
+        area = pixels[left:left + self.bins, bottom - max_height:bottom]
+        # Columns past the right edge of the screen are cut off
+        width = area.shape[0]
+        mask = np.arange(max_height)[None, :] >= (max_height - bars[:width])[:, None]
+        area[mask] = np.broadcast_to(colors[:width, None], area.shape)[mask]
+        del area, pixels
@@ -0,0 +1,63 @@
+import numpy as np
+
+class RingBuffer:
+    # Initialize a fixed size buffer of values that overwrites its oldest value once it is full
+    # When fill is given the buffer starts full of that value
+    def __init__(self, size, fill=None):
+        self.data = np.zeros(size)
+        self.head = 0
+        self.count = 0
+        if fill is not None:
+            self.data[:] = fill
+            self.count = size
+
+    # Returns the number of values in the buffer
+    def __len__(self):
+        return self.count
+
+    # Adds a value in place of the oldest value
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % len(self.data)
+        self.count = min(self.count + 1, len(self.data))
+
+    # Returns the values in the buffer from oldest to newest
+    def values(self):
+        if self.count < len(self.data):
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+
+
+
+
+class History:
+    # Initialize a time series that keeps the latest size values in a ring buffer
+    # Each of the tiers keeps another size values that are averages of factor values from the tier below,
+    # so longer stretches of history are kept at lower resolution without growing
+    def __init__(self, size, tiers=0, factor=10, fill=None):
+        self.factor = factor
+        self.tiers = [RingBuffer(size, fill) for _ in range(tiers + 1)]
+        self.sums = [0.0] * (tiers + 1)
+        self.counts = [0] * (tiers + 1)
+
+    # Returns the number of values in the full resolution tier
+    def __len__(self):
+        return len(self.tiers[0])
+
+    # Adds a value to the series and passes averages on to the lower resolution tiers
+    def append(self, value):
+        self.tiers[0].append(value)
+        for tier in range(1, len(self.tiers)):
+            self.sums[tier] += value
+            self.counts[tier] += 1
+            if self.counts[tier] < self.factor:
+                break
+            value = self.sums[tier] / self.counts[tier]
+            self.tiers[tier].append(value)
+            self.sums[tier] = 0.0
+            self.counts[tier] = 0
+
+    # Returns the values of a tier from oldest to newest (tier 0 is full resolution)
+    def values(self, tier=0):
+        return self.tiers[tier].values()
@@ -0,0 +1,74 @@
+import math
+import pygame
+
+# Returns the value rounded up to a number of significant digits (41234 --> 42000) so axis scales only change in steps
+def niceCeil(val, digits=2):
+    if val <= 0:
+        return 1
+    step = 10 ** (math.floor(math.log10(val)) - digits + 1)
+    return math.ceil(round(val / step, 6)) * step
+
+
+
+
+
+
+class Hud:
+    # Initialize a heads up display that caches fonts, rendered text, and the static backgrounds of the graph panels
+    # The panels are redrawn at most rate times per second (or every frame when rate is None)
+    def __init__(self, rate=10, font="Arial", max_labels=1024):
+        self.rate = rate
+        self.font_name = font
+        self.max_labels = max_labels
+        self.fonts = {}
+        self.labels = {}
+        self.layers = {}
+        self.elapsed = math.inf
+
+    # Returns the font of a size, loading it only the first time it is used
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont(self.font_name, size)
+        return self.fonts[size]
+
+    # Returns the rendered and rotated surface of some text, rendering it only the first time it is used
+    def label(self, text, color, size=11, angle=0):
+        key = (text, color, size, angle)
+        if key not in self.labels:
+            # Forget old labels once there are too many, since changing scales keep making new ones
+            if len(self.labels) >= self.max_labels:
+                self.labels.clear()
+            surface = self.font(size).render(text, True, color)
+            self.labels[key] = pygame.transform.rotate(surface, angle)
+        return self.labels[key]
+
+    # Draws text to the screen centered at a certain location
+    def text(self, screen, text, x, y, color, size=11, angle=0):
+        surface = self.label(text, color, size, angle)
+        rect = surface.get_rect()
+        rect.center = (x, y)
+        screen.blit(surface, rect)
+
+    # Returns the background of a graph panel with its title and horizontal grid lines labelled from bottom to top
+    # The background is kept on an offscreen surface and only redrawn when the labels (the axis scale) change
+    def grid(self, title, labels, width, height):
+        key = (tuple(labels), width, height)
+        cached = self.layers.get(title)
+        if cached is None or cached[0] != key:
+            surface = pygame.Surface((width, height))
+            self.text(surface, title, width - 25, height // 2, (200, 200, 200), 16, -90)
+            for i, label in enumerate(labels):
+                y = (height - 25) - ((height - 50) * i // (len(labels) - 1))
+                self.text(surface, label, 20, y, "white")
+                pygame.draw.line(surface, (42, 42, 42), (40, y), (width - 50, y), 1)
+            cached = (key, surface)
+            self.layers[title] = cached
+        return cached[1]
+
+    # Returns whether the panels are due to be redrawn after another elapsed seconds
+    def due(self, elapsed):
+        self.elapsed += elapsed
+        if not self.rate or self.elapsed >= 1 / self.rate:
+            self.elapsed = 0
+            return True
+        return False
@@ -0,0 +1,72 @@
+import math
+import numpy as np
+from Broadphase import NeighbourList
+
+# The distance at which the Lennard-Jones potential is deepest in units of its sigma
+LJ_MINIMUM = 2 ** (1 / 6)
+# The distance at which the Lennard-Jones attraction is strongest in units of the distance at which it is deepest
+LJ_PEAK = (13 / 7) ** (1 / 6)
+# The largest stiffness of each kind of potential, in units of epsilon over the square of the sum of the radii
+STIFFNESS = {"soft": 2, "lj": 7.5}
+# The strength of each kind of potential when none is given, which suits particles moving at the speeds of the viewers
+EPSILON = {"soft": 10000, "lj": 500}
+
+
+
+
+
+class PairPotential:
+    # Short range forces change quickly as particles approach so they are applied every substep instead of once per step
+    substep = True
+
+    # Initialize a short range force between pairs of particles closer than a cutoff
+    # kind is "soft" for soft spheres that push apart with energy epsilon * (1 - d / s)^2 while they overlap (s is the sum of their radii),
+    # which replace hard collisions, or "lj" for the attraction of the Lennard-Jones potential 4 * epsilon * ((s' / d)^12 - (s' / d)^6)
+    # with s' = s / 2^(1/6) so it is deepest where they touch, where hard collisions take the place of its steep repulsive core
+    # cutoff is in units of s (1 for soft spheres and 2.5 s' for Lennard-Jones by default)
+    # Pairs come from a Verlet neighbour list that is only rebuilt once the particles may have closed a gap of skin
+    # (by default sized from how fast the particles have been moving so the list lasts a few substeps, up to the largest diameter)
+    def __init__(self, kind="soft", epsilon=None, cutoff=None, skin=None):
+        if kind not in STIFFNESS:
+            raise ValueError(f"Unknown pair potential: {kind}")
+        self.kind = kind
+        self.epsilon = EPSILON[kind] if epsilon is None else epsilon
+        if cutoff is None:
+            cutoff = 1 if kind == "soft" else 2.5 / LJ_MINIMUM
+        self.cutoff = cutoff
+        self.neighbours = NeighbourList(cutoff, skin)
+
+    # Returns the largest time step that resolves the stiffest pair, a fraction of the period of two of the lightest particles touching
+    def maxStep(self, world):
+        stiffness = STIFFNESS[self.kind] * abs(self.epsilon) / (2 * float(world.radius.min())) ** 2
+        return 0.5 * math.sqrt(float(world.mass.min()) / 2 / stiffness) if stiffness > 0 else math.inf
+
+    # Returns the size of the force pushing apart each pair of particles dist apart, which is negative when it pulls them together
+    def magnitude(self, dist, contact):
+        if self.kind == "soft":
+            return 2 * self.epsilon * (1 - dist / contact) / contact
+        # Closer than where the attraction peaks it stays at its strongest, so the force never changes faster than within the smooth tail
+        dist = np.maximum(dist, LJ_PEAK * contact)
+        ratio = (contact / LJ_MINIMUM / dist) ** 6
+        return 24 * self.epsilon * (2 * ratio * ratio - ratio) / dist
+
+    # Returns the acceleration of every particle of a world from the pairs within their cutoff
+    def accelerations(self, world):
+        pos, mass, radius = world.pos, world.mass, world.radius
+        count, dim = pos.shape
+        acc = np.zeros((count, dim))
+        if count < 2 or self.epsilon == 0:
+            return acc
+        i, j = self.neighbours.pairs(pos, radius, world.box)
+
+        # Only the pairs in the list that are within their cutoff right now feel the force
+        diff = pos[j] - pos[i]
+        dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        contact = radius[i] + radius[j]
+        near = (dist < self.cutoff * contact) & (dist > 0)
+        i, j, diff, dist, contact = i[near], j[near], diff[near], dist[near], contact[near]
+        push = diff * (self.magnitude(dist, contact) / dist)[:, None]
+        for axis in range(dim):
+            acc[:, axis] += np.bincount(j, push[:, axis] / mass[j], minlength=count)
+            acc[:, axis] -= np.bincount(i, push[:, axis] / mass[i], minlength=count)
+        return acc
@@ -0,0 +1,288 @@
+import math, multiprocessing, os, time
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+import numpy as np
+from Broadphase import CellGrid
+from World import checkWalls, resolvePairs, substeps
+
+# Creates a NumPy array backed by a new block of shared memory and returns both
+def sharedArray(shape, dtype=np.float64):
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+# Attaches to a block of shared memory created by another process and returns it with its array
+def attachArray(name, shape, dtype=np.float64):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+# Returns the slab of each x, the one with bounds[s] <= x < bounds[s + 1] for slabs that are width wide
+# Dividing by the width can round an x on a bound into the slab next to it, so those are moved back by comparing with the bounds
+def slabOf(x, bounds, width):
+    slab = np.clip(x / width, 0, len(bounds) - 2).astype(np.intp)
+    slab -= x < bounds[slab]
+    slab += x >= bounds[slab + 1]
+    return slab
+
+# Sorts the particles by the slab they are in with a radix sort of the slab numbers
+# order lists the particles slab by slab and the particles of slab s are order[edges[s]:edges[s + 1]]
+def sortSlabs(slab, order, edges):
+    order[:] = np.argsort(slab, kind="stable")
+    edges[:] = np.searchsorted(slab[order], np.arange(len(edges)))
+
+# Returns the indices of the particles with start <= x < end in increasing order
+# Only the slabs within drift of the range are searched, where drift is the furthest any particle has moved since they were sorted
+def slabMembers(pos, order, edges, bounds, start, end, drift):
+    first = np.searchsorted(bounds, start - drift, side="right") - 1
+    last = np.searchsorted(bounds, end + drift, side="left")
+    near = order[edges[first]:edges[last]]
+    x = pos[near, 0]
+    return np.sort(near[(x >= start) & (x < end)])
+
+# Resolves the collisions owned by one slab of the box between the particles idx in it and its halo
+# A slab owns every pair whose leftmost particle is inside it, so its partner is at most a halo width to the right
+# Returns the number of collisions, the change in total kinetic energy they caused, and the furthest they moved a particle
+def collideSlab(pos, vel, mass, radius, idx, start, end, halo, box, size, damping):
+    x = pos[:, 0]
+    if len(idx) < 2:
+        return 0, 0.0, 0.0
+    # Find candidate pairs with a grid over just this slab and its halo
+    low = max(start, 0.0)
+    width = min(end + halo, box[0]) - low
+    local_box = np.concatenate(([max(width, size)], box[1:]))
+    grid = CellGrid.sized(local_box, size)
+    local = pos[idx] - np.concatenate(([low], np.zeros(len(box) - 1)))
+    i, j = grid.pairs(local, radius[idx])
+    i = idx[i]
+    j = idx[j]
+    owner = np.where(x[i] <= x[j], x[i], x[j])
+    keep = owner < end
+    return resolvePairs(pos, vel, mass, radius, i[keep], j[keep], damping)
+
+# Runs in each worker process and steps its share of the particles whenever the main process sends it a step over conn
+# Each step is a time step and a number of substeps, and the worker replies with its collisions and change in kinetic energy
+# A worker gives up when the barrier between workers breaks because another worker died or stopped responding
+def worker(rank, workers, names, count, dim, box, bounds, halo, size, damping, conn, inner, moved):
+    shms = []
+    arrays = []
+    shapes = ((count, dim), (count, dim), (count,), (count,), (count,), (count,), (len(bounds),))
+    dtypes = (np.float64,) * 4 + (np.int16, np.int64, np.int64)
+    for name, shape, dtype in zip(names, shapes, dtypes):
+        shm, array = attachArray(name, shape, dtype)
+        shms.append(shm)
+        arrays.append(array)
+    pos, vel, mass, radius, slabs, order, edges = arrays
+    box = np.asarray(box)
+    bounds = np.asarray(bounds)
+    width = box[0] / (len(bounds) - 1)
+    first = count * rank // workers
+    last = count * (rank + 1) // workers
+    try:
+        # Waiting for the next step has no time limit since the main process may be busy between steps
+        while (message := conn.recv()) is not None:
+            dt, substeps = message
+            total = 0
+            change = 0.0
+            for _ in range(substeps):
+                # Move this worker's share of the particles over the substep, handle wall collisions, and find the slab of each
+                pos[first:last] += vel[first:last] * dt
+                change += checkWalls(pos[first:last], vel[first:last], radius[first:last], box, damping, mass[first:last])
+                slabs[first:last] = slabOf(pos[first:last, 0], bounds, width)
+                inner.wait()
+                # Sort the particles by slab once for the substep so each slab only looks at its own particles
+                if rank == 0:
+                    sortSlabs(slabs, order, edges)
+                inner.wait()
+                # Resolve collisions in the even slabs and then the odd slabs, so slabs working at the same time never share particles
+                # The odd slabs widen their search by how far the even slabs moved particles after they were sorted
+                drift = 0.0
+                for phase in (0, 1):
+                    slab = 2 * rank + phase
+                    start, end = bounds[slab], bounds[slab + 1]
+                    idx = slabMembers(pos, order, edges, bounds, start, end + halo, drift)
+                    hits, delta, moved[slab] = collideSlab(pos, vel, mass, radius, idx, start, end, halo, box, size, damping)
+                    total += hits
+                    change += delta
+                    inner.wait()
+                    drift = max(moved[0::2])
+            conn.send((total, change))
+    except (BrokenBarrierError, EOFError):
+        pass
+    finally:
+        # Drop the arrays before closing the memory they point into
+        pos = vel = mass = radius = slabs = order = edges = arrays = None
+        for shm in shms:
+            shm.close()
+
+
+
+
+
+class ParallelWorld:
+    # Initialize a world whose particle arrays live in shared memory and are stepped by a pool of worker processes
+    # The box is split into twice as many slabs along the x axis as there are workers and each worker owns two of them
+    # The total kinetic energy is kept up to date from the changes reported by the workers and is recomputed from scratch every resync steps
+    # A step raises a RuntimeError instead of hanging when a worker dies or takes more than timeout seconds to finish it
+    def __init__(self, mass, pos, vel, box, friction=1, radius_factor=1/3, workers=None, cfl=1, max_substeps=64, resync=100, timeout=60):
+        pos = np.asarray(pos, dtype=np.float64)
+        count, self.dim = pos.shape
+        self.box = np.asarray(box, dtype=np.float64)
+        self.friction = friction
+        self.shms = []
+        self.pos = self.share(pos)
+        self.vel = self.share(vel)
+        self.mass = self.share(np.broadcast_to(mass, count))
+        self.radius = self.share(self.mass * radius_factor)
+        self.collisions = 0
+        self.cfl = cfl
+        self.max_substeps = max_substeps
+        self.substeps = 1
+        self.resync = resync
+        self.timeout = timeout
+        self.steps = 0
+        self.recomputeKE()
+
+        # Slabs must be at least two halos wide so slabs resolved at the same time never touch the same particles
+        self.size = 2 * float(self.radius.max())
+        self.halo = 1.5 * self.size
+        workers = workers or os.cpu_count() or 1
+        self.workers = max(1, min(workers, int(self.box[0] // (4 * self.halo))))
+        bounds = np.linspace(0, self.box[0], 2 * self.workers + 1)
+        bounds[0] = -math.inf
+        bounds[-1] = math.inf
+        self.bounds = bounds.tolist()
+        # Shared scratch arrays for the slab of every particle and the particles sorted by slab
+        self.slabs = self.share(np.zeros(count), np.int16)
+        self.order = self.share(np.zeros(count), np.int64)
+        self.edges = self.share(np.zeros(len(self.bounds)), np.int64)
+
+        # Start the worker processes and leave them waiting for the first step
+        # Workers wait for each other at a barrier that breaks after timeout seconds so they never wait forever for a dead worker
+        self.inner = multiprocessing.Barrier(self.workers, timeout=timeout)
+        self.moved = multiprocessing.Array("d", 2 * self.workers)
+        names = [shm.name for shm in self.shms]
+        self.processes = []
+        self.conns = []
+        for rank in range(self.workers):
+            conn, child = multiprocessing.Pipe()
+            args = (rank, self.workers, names, count, self.dim, self.box.tolist(), self.bounds, self.halo, self.size,
+                    friction, child, self.inner, self.moved)
+            process = multiprocessing.Process(target=worker, args=args, daemon=True)
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.conns.append(conn)
+
+    # Creates a world stepped by worker processes with the same particles as an array based World
+    @classmethod
+    def fromWorld(cls, world, workers=None):
+        return cls(world.mass, world.pos, world.vel, world.box, world.friction, world.radius / world.mass, workers)
+
+    # Copies an array into a new block of shared memory and returns the shared array
+    def share(self, values, dtype=np.float64):
+        values = np.asarray(values, dtype=dtype)
+        shm, array = sharedArray(values.shape, dtype)
+        array[:] = values
+        self.shms.append(shm)
+        return array
+
+    # Returns the number of particles in the world
+    def __len__(self):
+        return len(self.pos)
+
+    # Get the momentum of every particle based on its mass and velocity
+    def mom(self):
+        return self.vel * self.mass[:, None]
+
+    # Get the kinetic energy of every particle based on its mass and velocity
+    def ke(self):
+        return 0.5 * self.mass * np.einsum("ij,ij->i", self.vel, self.vel)
+
+    # Get the total kinetic energy of the system
+    def totalKE(self):
+        return self.total_ke
+
+    # Recomputes the total kinetic energy from every particle to correct drift in the running total
+    def recomputeKE(self):
+        self.total_ke = float(self.ke().sum())
+        return self.total_ke
+
+    # Adds a change in kinetic energy made from outside the world (for example by heating) to the running total
+    def addKE(self, change):
+        self.total_ke += change
+
+    # Advance the whole system by a time of dt in enough substeps that fast particles cannot skip past each other
+    def step(self, dt=1):
+        self.substeps = substeps(self.vel, self.radius, dt, self.cfl, self.max_substeps)
+        # Start every worker on the substeps of this step and wait for all of them to finish
+        for rank, conn in enumerate(self.conns):
+            try:
+                conn.send((dt / self.substeps, self.substeps))
+            except BrokenPipeError:
+                self.processes[rank].join(self.timeout)
+                self.fail(f"Parallel worker {rank} exited with code {self.processes[rank].exitcode}")
+        replies = self.gather()
+        self.collisions = sum(hits for hits, _ in replies)
+        self.total_ke += sum(change for _, change in replies)
+        self.steps += 1
+        if self.resync and self.steps % self.resync == 0:
+            self.recomputeKE()
+
+    # Returns the reply of every worker to the step it was sent
+    # If a worker dies or the step takes longer than timeout seconds the world is closed and a RuntimeError is raised instead of waiting forever
+    def gather(self):
+        deadline = time.monotonic() + self.timeout
+        replies = []
+        for rank, (conn, process) in enumerate(zip(self.conns, self.processes)):
+            # Poll in short waits so a worker that died is noticed straight away
+            while not conn.poll(0.1):
+                if not process.is_alive():
+                    self.fail(f"Parallel worker {rank} exited with code {process.exitcode}")
+                if time.monotonic() > deadline:
+                    self.fail(f"Parallel worker {rank} did not finish a step within {self.timeout} seconds")
+            try:
+                replies.append(conn.recv())
+            except EOFError:
+                process.join()
+                self.fail(f"Parallel worker {rank} exited with code {process.exitcode}")
+        return replies
+
+    # Kills every worker straight away, frees the shared memory, and raises a RuntimeError with a message
+    def fail(self, message):
+        for process in self.processes:
+            process.kill()
+        self.close()
+        raise RuntimeError(message)
+
+    # Stops the worker processes and frees the shared memory
+    # Workers that do not stop within timeout seconds are terminated
+    def close(self):
+        if not self.processes:
+            return
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in zip(self.processes, self.conns):
+            process.join(self.timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+        self.processes = []
+        self.conns = []
+        # Drop the arrays before closing the memory they point into
+        self.pos = self.vel = self.mass = self.radius = None
+        self.slabs = self.order = self.edges = None
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+
+    # Allows the world to be used in a with statement that closes it at the end
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
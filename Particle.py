@@ -1,96 +1,143 @@
-import pygame
+import itertools
+import numpy as np
+from Vector import Vector, Vector2, Vector3
+
+# Names of the setters for the component of a vector along each axis
+SETTERS = ("setX", "setY", "setZ")
+
+# Returns the offsets of every zone in the neighbourhood of a zone (including the zone itself) in any number of dimensions
+def fullStencil(dim, reach=1):
+    return list(itertools.product(range(-reach, reach + 1), repeat=dim))
+
+
+
+
+
+class Zones:
+    # Initialize zones of the given size along each axis that keep track of the particles inside them
+    # Zones are only created once a particle enters them, so the same zones work for any number of dimensions and any box
+    def __init__(self, sizes):
+        self.sizes = tuple(sizes)
+        self.dim = len(self.sizes)
+        self.stencil = fullStencil(self.dim)
+        self.zones = {}
+
+    # Returns the zone a position is in as a tuple with one index along each axis
+    def key(self, pos):
+        return tuple(int(c // s) for c, s in zip(pos.els, self.sizes))
+
+    # Adds a particle to a zone
+    def add(self, particle, zone):
+        members = self.zones.get(zone)
+        if members is None:
+            members = self.zones[zone] = set()
+        members.add(particle)
+
+    # Moves a particle from one zone to another
+    def move(self, particle, old, new):
+        self.zones[old].discard(particle)
+        self.add(particle, new)
+
+    # Returns every particle in a zone and the zones around it
+    def near(self, zone):
+        for offset in self.stencil:
+            members = self.zones.get(tuple(z + o for z, o in zip(zone, offset)))
+            if members:
+                yield from members
+
+
+
+
 
 class Particle:
-    # Initialize a particle with mass, position, and velocity
-    def __init__(self, mass, pos, vel, rsize, csize, zones):
+    # Initialize a particle with mass, position, and velocity in its zone
+    # The number of dimensions comes from the vectors and zones, and radius_factor converts mass to radius
+    # (1/3 in the 2D simulation and 1/2 in the 3D simulation)
+    def __init__(self, mass, pos, vel, zones, radius_factor=1/3):
         self.pos = pos
         self.vel = vel
         self.mass = mass
-        self.radius = mass / 3
-        self.rsize = rsize
-        self.csize = csize
-        self.zone = (int(pos.y() // rsize), int(pos.x() // csize))
+        self.radius = mass * radius_factor
         self.zones = zones
-        self.zones[self.zone[0]][self.zone[1]].add(self)
-    
+        self.zone = zones.key(pos)
+        zones.add(self, self.zone)
+
     # Get the momentum of the particle based on its mass and velocity
     def mom(self):
         return self.vel.scale(self.mass)
-    
+
     # Get the kinetic energy of the particle based on its mass and velocity
     def ke(self):
         return 0.5 * self.mass * (self.vel.mag() ** 2)
-    
-    # Update position based on velocity and velocity based on acceleration
-    def update(self, maxX, maxY, damping=1):
+
+    # Update position based on velocity over a time of dt inside a box with the size along each axis
+    # Returns whether the particle moved to a different zone
+    def update(self, box, damping=1, dt=1):
         # Update position based on velocity
-        self.pos = self.pos + self.vel
+        self.pos.addScaled_(self.vel, dt)
 
         # Handle wall collisions
-        self.checkWalls(maxX, maxY, damping)
-
-        # Determine new zone (row and column)
-        row = int(self.pos.y() // self.rsize)
-        col = int(self.pos.x() // self.csize)
+        self.checkWalls(box, damping)
 
         # Check if the zone has changed and update accordingly
-        if self.zone != (row, col):
-            self.zones[self.zone[0]][self.zone[1]].remove(self)
-            self.zone = (row, col)
-            self.zones[row][col].add(self)
-
+        zone = self.zones.key(self.pos)
+        if zone != self.zone:
+            self.zones.move(self, self.zone, zone)
+            self.zone = zone
+            return True
+        return False
 
     # Check for an handle an elastic collison between self and other with optional damping
+    # Returns whether the particles collided
     def collide(self, other, damping=1):
         # Check if the two particles are colliding
-        if self.pos.dist(other.pos) < self.radius + other.radius:
-            # Make overlapping particles just barely touch
-            overlap = (other.pos - self.pos).mag() - (self.radius + other.radius)
-            other.pos -= (other.pos - self.pos).norm().scale(0.5 * overlap)
-            self.pos -= (self.pos - other.pos).norm().scale(0.5 * overlap)
-
-            # Calculate relative position and velocity vectors
-            self_diff = other.pos - self.pos
-            other_diff = self.pos - other.pos
-            self_vel_diff = other.vel - self.vel
-            other_vel_diff = self.vel - other.vel
-
-            # Adjust velocity of particle 1 based on conservation of momentum
-            self_proj = self_vel_diff.proj(self_diff)
-            self.vel += self_proj.scale(2 * other.mass / (self.mass + other.mass))
-
-            # Adjust velocity of particle 2 based on conservation of momentum
-            other_proj = other_vel_diff.proj(other_diff)
-            other.vel += other_proj.scale(2 * self.mass / (self.mass + other.mass))
-
-            # Dampen particle velocities to simulate friction
-            self.vel = self.vel.scale(damping)
-            other.vel = other.vel.scale(damping)
-    
-    # Checks for and handles elastic collision with a wall with otional damping
-    def checkWalls(self, maxX, maxY, damping=1):
-        # Check left wall collision
-        if self.pos.x() - self.radius < 0:
-            self.vel.setX(self.vel.x() * -1)
-            self.pos.setX(self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check right wall collision
-        elif self.pos.x() + self.radius > maxX:
-            self.vel.setX(self.vel.x() * -1)
-            self.pos.setX(maxX - self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check top wall collision
-        if self.pos.y() - self.radius < 0:
-            self.vel.setY(self.vel.y() * -1)
-            self.pos.setY(self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check bottom wall collision
-        elif self.pos.y() + self.radius > maxY:
-            self.vel.setY(self.vel.y() * -1)
-            self.pos.setY(maxY - self.radius)
-            self.vel = self.vel.scale(damping)
-    
+        rsum = self.radius + other.radius
+        if not self.pos.within(other.pos, rsum):
+            return False
+
+        # Make overlapping particles just barely touch by moving each half the overlap along the line between them
+        diff = other.pos - self.pos
+        dist = diff.mag()
+        if dist > 0:
+            push = diff.scale(0.5 * (dist - rsum) / dist)
+            other.pos -= push
+            self.pos += push
+
+        # Calculate relative position and velocity vectors
+        diff = other.pos - self.pos
+        vel_diff = other.vel - self.vel
+
+        # Adjust both velocities along the line between the particles based on conservation of momentum
+        # (the projection for particle 2 is the same as for particle 1 with both differences flipped)
+        dist_sq = diff.magSQ()
+        if dist_sq > 0:
+            s = (vel_diff * diff) / dist_sq
+            self.vel.addScaled_(diff, s * 2 * other.mass / (self.mass + other.mass))
+            other.vel.addScaled_(diff, -s * 2 * self.mass / (self.mass + other.mass))
+
+        # Dampen particle velocities to simulate friction
+        self.vel.scale_(damping)
+        other.vel.scale_(damping)
+        return True
+
+    # Checks for and handles elastic collisions with the low and high wall on every axis with optional damping
+    def checkWalls(self, box, damping=1):
+        for axis, (coord, limit) in enumerate(zip(self.pos.els, box)):
+            # Check the low wall first and only check the high wall if it missed
+            if coord - self.radius < 0:
+                coord = self.radius
+            elif coord + self.radius > limit:
+                coord = limit - self.radius
+            else:
+                continue
+            setter = SETTERS[axis]
+            getattr(self.vel, setter)(-self.vel.els[axis])
+            getattr(self.pos, setter)(coord)
+            self.vel.scale_(damping)
+
     def draw(self, screen):
+        # PyGame is only needed for drawing so headless code can use particles without it
+        import pygame
         color = pygame.Color(255, 255, 255)
 
         # hue = 0 if self.ke() > 1000 else 220
@@ -106,113 +153,29 @@ class Particle:
 
 
 
-
-
-
-import pygame
-
-class Particle3D:
-    # Initialize a particle with mass, position, and velocity
-    def __init__(self, mass, pos, vel, xsize, ysize, zsize, zones):
-        self.pos = pos
-        self.vel = vel
-        self.mass = mass
-        self.radius = mass / 2
-        self.xsize = xsize
-        self.ysize = ysize
-        self.zsize = zsize
-        x = int(self.pos.x() // self.xsize)
-        y = int(self.pos.y() // self.ysize)
-        z = int(self.pos.z() // self.zsize)
-        self.zone = (x, y, z)
-        self.zones = zones
-        self.zones[self.zone[0]][self.zone[1]][self.zone[2]].add(self)
-    
-    # Get the momentum of the particle based on its mass and velocity
-    def mom(self):
-        return self.vel.scale(self.mass)
-    
-    # Get the kinetic energy of the particle based on its mass and velocity
-    def ke(self):
-        return 0.5 * self.mass * (self.vel.mag() ** 2)
-    
-    # Update position based on velocity and velocity based on acceleration
-    def update(self, maxX, maxY, maxZ, damping=1):
-        # Update position based on velocity
-        self.pos = self.pos + self.vel
-
-        # Handle wall collisions
-        self.checkWalls(maxX, maxY, maxZ, damping)
-
-        # Determine new zone (row and column)
-        x = int(self.pos.x() // self.xsize)
-        y = int(self.pos.y() // self.ysize)
-        z = int(self.pos.z() // self.zsize)
-
-        # Check if the zone has changed and update accordingly
-        if self.zone != (x, y, z):
-            if self in self.zones[self.zone[0]][self.zone[1]][self.zone[2]]:
-                self.zones[self.zone[0]][self.zone[1]][self.zone[2]].remove(self)
-            self.zone = (x, y, z)
-            self.zones[x][y][z].add(self)
-
-
-    # Check for an handle an elastic collison between self and other with optional damping
-    def collide(self, other, damping=1):
-        # Check if the two particles are colliding
-        if self.pos.dist(other.pos) < self.radius + other.radius:
-            # Make overlapping particles just barely touch
-            overlap = (other.pos - self.pos).mag() - (self.radius + other.radius)
-            other.pos -= (other.pos - self.pos).norm().scale(0.5 * overlap)
-            self.pos -= (self.pos - other.pos).norm().scale(0.5 * overlap)
-
-            # Calculate relative position and velocity vectors
-            self_diff = other.pos - self.pos
-            other_diff = self.pos - other.pos
-            self_vel_diff = other.vel - self.vel
-            other_vel_diff = self.vel - other.vel
-
-            # Adjust velocity of particle 1 based on conservation of momentum
-            self_proj = self_vel_diff.proj(self_diff)
-            self.vel += self_proj.scale(2 * other.mass / (self.mass + other.mass))
-
-            # Adjust velocity of particle 2 based on conservation of momentum
-            other_proj = other_vel_diff.proj(other_diff)
-            other.vel += other_proj.scale(2 * self.mass / (self.mass + other.mass))
-
-            # Dampen particle velocities to simulate friction
-            self.vel = self.vel.scale(damping)
-            other.vel = other.vel.scale(damping)
-    
-    # Checks for and handles elastic collision with a wall with otional damping
-    def checkWalls(self, maxX, maxY, maxZ, damping=1):
-        # Check left wall collision
-        if self.pos.x() - self.radius < 0:
-            self.vel.setX(self.vel.x() * -1)
-            self.pos.setX(self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check right wall collision
-        elif self.pos.x() + self.radius > maxX:
-            self.vel.setX(self.vel.x() * -1)
-            self.pos.setX(maxX - self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check top wall collision
-        if self.pos.y() - self.radius < 0:
-            self.vel.setY(self.vel.y() * -1)
-            self.pos.setY(self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check bottom wall collision
-        elif self.pos.y() + self.radius > maxY:
-            self.vel.setY(self.vel.y() * -1)
-            self.pos.setY(maxY - self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check back wall collision
-        if self.pos.z() - self.radius < 0:
-            self.vel.setZ(self.vel.z() * -1)
-            self.pos.setZ(self.radius)
-            self.vel = self.vel.scale(damping)
-        # Check front wall collision
-        elif self.pos.z() + self.radius > maxZ:
-            self.vel.setZ(self.vel.z() * -1)
-            self.pos.setZ(maxZ - self.radius)
-            self.vel = self.vel.scale(damping)
\ No newline at end of file
+# Advances every particle by a time of dt like the main loops of the original simulations,
+# updating each particle in order and then colliding it with the other particles in its zone and the zones around it
+# Returns the number of pair tests, collisions, and zone changes
+def stepParticles(particles, zones, box, damping=1, dt=1):
+    tests = collisions = changes = 0
+    for p in particles:
+        changes += p.update(box, damping, dt)
+        for other in zones.near(p.zone):
+            if other is not p:
+                tests += 1
+                collisions += p.collide(other, damping)
+    return tests, collisions, changes
+
+# Creates randomly placed particles with random velocities and the zones they are in, like randomWorld does for a World
+# With the same seed the particles start at the same positions and velocities as randomWorld
+# Zones default to twice the radius wide so colliding particles are always in neighbouring zones
+def randomParticles(count, box, mass=20, speed=10, radius_factor=1/3, margin=None, seed=None, zone_size=None):
+    rng = np.random.default_rng(seed)
+    box = np.asarray(box, dtype=np.float64)
+    margin = mass if margin is None else margin
+    pos = rng.uniform(margin, box - margin, (count, len(box)))
+    vel = rng.uniform(-speed, speed, (count, len(box)))
+    zones = Zones([zone_size or 2 * mass * radius_factor] * len(box))
+    make = {2: Vector2, 3: Vector3}.get(len(box), lambda *els: Vector(list(els)))
+    particles = [Particle(mass, make(*p), make(*v), zones, radius_factor) for p, v in zip(pos.tolist(), vel.tolist())]
+    return particles, zones
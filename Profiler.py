@@ -0,0 +1,93 @@
+import csv, time
+from History import RingBuffer
+
+# The phases of a frame in the viewers, where forces, update, pairs, and collide are the parts of physics timed by a World
+PHASES = ["events", "physics", "forces", "update", "pairs", "collide", "draw", "graph", "dist", "display"]
+# The events counted by a World in each frame, where list_builds counts rebuilds of the neighbour lists of pair potentials
+COUNTERS = ["pair_tests", "collisions", "zone_changes", "list_builds"]
+
+
+
+
+
+class Profiler:
+    # Initialize a profiler that times named phases of each frame and counts events like pair tests and collisions
+    # Rolling averages are kept over the last window frames and every frame is written as a row to a CSV file when path is given
+    # Nothing is timed or counted until the profiler is enabled, and code being profiled only checks whether it is set
+    def __init__(self, phases=PHASES, counters=COUNTERS, window=60, path=None):
+        self.phases = list(phases)
+        self.counters = list(counters)
+        self.window = window
+        self.enabled = False
+        self.frames = 0
+        self.times = dict.fromkeys(self.phases, 0.0)
+        self.counts = dict.fromkeys(self.counters, 0)
+        self.history = {name: RingBuffer(window) for name in self.phases + self.counters}
+        self.overlay = None
+        self.file = None
+        if path is not None:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["frame"] + [f"{name}_ms" for name in self.phases] + self.counters)
+            self.enabled = True
+
+    # Returns whether the profiler is timing phases
+    def __bool__(self):
+        return self.enabled
+
+    # Returns the current time of the monotonic clock used for every phase
+    def now(self):
+        return time.perf_counter()
+
+    # Adds the time since start to a phase and returns the current time so the next phase can start from it
+    def lap(self, name, start):
+        now = time.perf_counter()
+        self.times[name] += now - start
+        return now
+
+    # Adds to one of the counters
+    def count(self, name, amount=1):
+        self.counts[name] += amount
+
+    # Finishes a frame by adding its times and counts to the rolling averages and the CSV file and starting the next frame
+    def endFrame(self):
+        if not self.enabled:
+            return
+        times = [1000 * self.times[name] for name in self.phases]
+        counts = [self.counts[name] for name in self.counters]
+        for name, value in zip(self.phases + self.counters, times + counts):
+            self.history[name].append(value)
+        if self.file is not None:
+            self.writer.writerow([self.frames] + [round(value, 4) for value in times] + counts)
+        self.times = dict.fromkeys(self.phases, 0.0)
+        self.counts = dict.fromkeys(self.counters, 0)
+        self.frames += 1
+
+    # Returns the average of a phase in milliseconds (or of a counter) over the last window frames
+    def average(self, name):
+        values = self.history[name]
+        return float(values.data[:len(values)].mean()) if len(values) else 0.0
+
+    # Draws the rolling averages of every phase and counter in a box at the top left of the screen
+    # The text is only rendered again when refresh is set (at the panel rate) so it stays readable and cheap
+    def draw(self, screen, hud, refresh, x=10, y=10):
+        # PyGame is only needed for drawing so the profiler can be used without it
+        import pygame
+        if refresh or self.overlay is None:
+            rows = [(name, f"{self.average(name):.2f} ms") for name in self.phases]
+            rows += [(name, f"{self.average(name):.0f}") for name in self.counters]
+            font = hud.font(13)
+            height = font.get_linesize()
+            self.overlay = pygame.Surface((170, 10 + height * len(rows)))
+            self.overlay.set_alpha(200)
+            for i, (name, value) in enumerate(rows):
+                self.overlay.blit(font.render(name, True, (200, 200, 200)), (5, 5 + i * height))
+                surface = font.render(value, True, "white")
+                self.overlay.blit(surface, (165 - surface.get_width(), 5 + i * height))
+        screen.blit(self.overlay, (x, y))
+
+    # Closes the CSV file
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,206 @@
+import json, queue, struct, threading
+import numpy as np
+from Checkpoint import aligned
+from SimProcess import Snapshot
+from Tools import kineticEnergy
+
+# Trajectory files start with these bytes followed by the length of a JSON header, the mass and radius arrays, and then the frames
+MAGIC = b"PSIMTRAJ"
+VERSION = 1
+
+# Returns the NumPy type of one recorded frame, which is the step it was taken at followed by the positions and velocities
+def frameType(count, dim, dtype):
+    return np.dtype([("steps", "<i8"), ("pos", dtype, (count, dim)), ("vel", dtype, (count, dim))])
+
+
+
+
+
+class Recorder:
+    # Initialize a recorder that streams the positions and velocities of a world to an append only trajectory file
+    # Only a frame every k steps of the world is kept and positions and velocities are stored as dtype (float16, float32, or float64)
+    # Frames are gathered into chunks of chunk frames which a background thread writes to the file so the simulation is not held up,
+    # and at most max_chunks chunks wait to be written before record waits for the writer to catch up
+    def __init__(self, path, world, dtype=np.float32, every=1, chunk=64, max_chunks=8):
+        self.count, self.dim = world.pos.shape
+        self.dtype = np.dtype(dtype)
+        self.every = max(1, every)
+        self.chunk = chunk
+        self.frame_type = frameType(self.count, self.dim, self.dtype)
+        self.calls = 0
+        self.last = None
+        self.frames = 0
+        self.buffer = np.zeros(chunk, self.frame_type)
+        self.filled = 0
+        self.error = None
+
+        # The header and the arrays that do not change are written before any frames
+        arrays = {
+            "mass": np.ascontiguousarray(world.mass, dtype=np.float64),
+            "radius": np.ascontiguousarray(world.radius, dtype=np.float64),
+        }
+        header = {
+            "version": VERSION,
+            "count": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype.str,
+            "every": self.every,
+            "box": np.asarray(world.box, dtype=np.float64).tolist(),
+            "friction": world.friction,
+            "arrays": {},
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = aligned(offset + array.nbytes)
+        header["frames"] = offset
+        text = json.dumps(header).encode()
+        start = aligned(len(MAGIC) + 8 + len(text))
+
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.file.write(struct.pack("<Q", len(text)))
+        self.file.write(text)
+        for name, array in arrays.items():
+            self.file.seek(start + header["arrays"][name]["offset"])
+            self.file.write(array.tobytes())
+        self.file.seek(start + offset)
+
+        self.chunks = queue.Queue(max_chunks)
+        self.thread = threading.Thread(target=self.write, daemon=True)
+        self.thread.start()
+
+    # Runs on the writer thread, appending chunks to the file until it is given None
+    def write(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            if self.error is None:
+                try:
+                    self.file.write(chunk.tobytes())
+                    self.file.flush()
+                except OSError as error:
+                    self.error = error
+
+    # Copies the positions and velocities of a world (or a snapshot of one) into the current chunk if this frame is kept
+    # A frame is kept once the world has taken at least every steps since the last kept frame, so the same step is never recorded
+    # twice (calls are counted instead of steps for worlds that do not count their steps)
+    def record(self, world):
+        if self.error is not None:
+            raise self.error
+        steps = getattr(world, "steps", self.calls)
+        self.calls += 1
+        if self.last is not None and steps - self.last < self.every:
+            return
+        self.last = steps
+        frame = self.buffer[self.filled]
+        frame["steps"] = steps
+        frame["pos"] = world.pos
+        frame["vel"] = world.vel
+        self.filled += 1
+        self.frames += 1
+        if self.filled == self.chunk:
+            self.flush()
+
+    # Hands the frames gathered so far to the writer thread and starts a new chunk
+    def flush(self):
+        if self.filled:
+            self.chunks.put(self.buffer[:self.filled])
+            self.buffer = np.zeros(self.chunk, self.frame_type)
+            self.filled = 0
+
+    # Writes any remaining frames, waits for the writer thread to finish, and closes the file
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.chunks.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+
+
+
+
+class Trajectory:
+    # Initialize a recorded trajectory by memory mapping its frames from a file
+    # Only whole frames are mapped so a file that is still being recorded can be read up to its last complete frame
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            length, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length))
+            size = f.seek(0, 2)
+        if header["version"] != VERSION:
+            raise ValueError(f"{path} has trajectory version {header['version']} but only version {VERSION} is supported")
+        start = aligned(len(MAGIC) + 8 + length)
+        self.header = header
+        self.count = header["count"]
+        self.dim = header["dim"]
+        self.every = header["every"]
+        self.box = np.array(header["box"])
+        self.friction = header["friction"]
+        arrays = {}
+        for name, info in header["arrays"].items():
+            arrays[name] = np.fromfile(path, dtype=info["dtype"], count=int(np.prod(info["shape"])), offset=start + info["offset"])
+        self.mass = arrays["mass"]
+        self.radius = arrays["radius"]
+
+        frame_type = frameType(self.count, self.dim, header["dtype"])
+        frames = (size - start - header["frames"]) // frame_type.itemsize
+        if frames <= 0:
+            raise ValueError(f"{path} has no recorded frames")
+        self.frames = np.memmap(path, dtype=frame_type, mode="r", offset=start + header["frames"], shape=(frames,))
+
+    # Returns the number of recorded frames
+    def __len__(self):
+        return len(self.frames)
+
+    # Returns the frame at an index as a snapshot with the same attributes the drawing functions use from a World
+    # The kinetic energy is computed from the recorded velocities
+    def frame(self, index, rate=0):
+        frame = self.frames[index]
+        pos = frame["pos"].astype(np.float64)
+        vel = frame["vel"].astype(np.float64)
+        return Snapshot(pos, vel, self.mass, self.radius, kineticEnergy(self.mass, vel), int(frame["steps"]), rate)
+
+
+
+
+
+class Replay:
+    # Initialize a player for a recorded trajectory with the same interface as LocalSim and SimProcess
+    # It plays fps recorded frames per real second (backwards when negative) starting from the frame at index start
+    def __init__(self, trajectory, fps=60, start=0):
+        self.trajectory = trajectory
+        self.fps = fps
+        self.seek(start)
+
+    # Recorded runs cannot be changed so actions like clicks and heating are ignored
+    def send(self, name, *args):
+        pass
+
+    def hold(self, name, *args):
+        pass
+
+    # Jumps to the frame at an index, stopping at the first and last frames
+    def seek(self, index):
+        self.position = float(min(max(index, 0), len(self.trajectory) - 1))
+
+    # Returns the index of the frame being shown
+    def index(self):
+        return int(self.position)
+
+    # Moves forward by the frames due in the real time that has elapsed since the last frame in seconds and returns that frame
+    # Playback stops at the first and last frames
+    def latest(self, elapsed):
+        self.seek(self.position + elapsed * self.fps)
+        return self.trajectory.frame(self.index(), self.fps)
+
+    # Nothing needs to be stopped when replaying
+    def close(self):
+        pass
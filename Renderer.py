@@ -0,0 +1,45 @@
+import pygame
+import numpy as np
+
+class SpriteRenderer:
+    # Initialize a renderer that draws particles from pre-rendered circle sprites
+    # Hues go from hue_max (blue) at zero kinetic energy down to 0 (red) at ke_scale, like the original per particle colors
+    # Radii are rounded to the nearest radius_step so projected particles of similar size share sprites
+    def __init__(self, ke_scale, hue_max=220, radius_step=0.5):
+        self.ke_scale = ke_scale
+        self.hue_max = hue_max
+        self.radius_step = radius_step
+        self.sprites = {}
+
+    # Returns the hue bucket of every particle from its kinetic energy
+    def hues(self, ke):
+        return np.maximum(0, self.hue_max - (self.hue_max * ke // self.ke_scale)).astype(np.int64)
+
+    # Returns the cached sprite of a circle with a hue and radius bucket, rendering it the first time it is needed
+    # Sprites use a black color key instead of per pixel alpha since color keyed blits are much faster
+    def sprite(self, hue, bucket):
+        key = (hue, bucket)
+        if key not in self.sprites:
+            radius = bucket * self.radius_step
+            size = 2 * int(radius) + 3
+            surface = pygame.Surface((size, size))
+            surface.set_colorkey((0, 0, 0))
+            color = pygame.Color(255, 255, 255)
+            color.hsla = (hue, 100, 50, 100)
+            pygame.draw.circle(surface, color, (size // 2, size // 2), radius)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            self.sprites[key] = surface
+        return self.sprites[key]
+
+    # Draws circles centered at x, y with radii r colored by kinetic energy ke in a single blit call
+    def draw(self, screen, x, y, r, ke):
+        hues = self.hues(ke)
+        buckets = np.round(r / self.radius_step).astype(np.int64)
+        # Sprites are centered on the particle position rounded to the nearest pixel like pygame.draw.circle
+        half = 1 + (buckets * self.radius_step).astype(np.int64)
+        left = (np.round(x) - half).astype(np.int64).tolist()
+        top = (np.round(y) - half).astype(np.int64).tolist()
+        sprite = self.sprite
+        blits = [(sprite(h, b), (px, py)) for h, b, px, py in zip(hues.tolist(), buckets.tolist(), left, top)]
+        screen.blits(blits, doreturn=False)
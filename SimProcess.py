@@ -0,0 +1,250 @@
+import multiprocessing, os, queue, time
+from multiprocessing import shared_memory
+import numpy as np
+from Tools import handleClick, handleSpace, heat
+from Checkpoint import saveCheckpoint
+
+# Actions the viewer can send to the simulation by name
+ACTIONS = {
+    "click": handleClick,
+    "space": handleSpace,
+    "heat": heat,
+    "save": saveCheckpoint,
+}
+
+
+
+
+
+class Snapshot:
+    # Initialize a read only copy of one simulation frame with the same attributes the drawing functions use from a World
+    def __init__(self, pos, vel, mass, radius, total_ke, steps, rate):
+        self.pos = pos
+        self.vel = vel
+        self.mass = mass
+        self.radius = radius
+        self.total_ke = total_ke
+        self.steps = steps
+        self.rate = rate
+
+    # Returns the number of particles in the frame
+    def __len__(self):
+        return len(self.pos)
+
+    # Get the kinetic energy of every particle based on its mass and velocity
+    def ke(self):
+        return 0.5 * self.mass * np.einsum("ij,ij->i", self.vel, self.vel)
+
+    # Get the total kinetic energy of the system when the frame was published
+    def totalKE(self):
+        return self.total_ke
+
+
+
+
+
+class SharedFrame:
+    # Initialize two frame buffers in shared memory so one can be written while the other is read
+    # Each buffer has a sequence number which is odd while it is being written so readers can detect torn copies
+    def __init__(self, count, dim):
+        self.count = count
+        self.dim = dim
+        size = 8 * (2 * (2 * count * dim + 3) + 2 + 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.owner = os.getpid()
+        self.views()
+
+    # Creates the array views into the shared memory block
+    def views(self):
+        n, d = self.count, self.dim
+        buf = self.shm.buf
+        self.pos = np.ndarray((2, n, d), np.float64, buf, 0)
+        self.vel = np.ndarray((2, n, d), np.float64, buf, 8 * 2 * n * d)
+        self.info = np.ndarray((2, 3), np.float64, buf, 8 * 4 * n * d)
+        self.seq = np.ndarray((2,), np.int64, buf, 8 * (4 * n * d + 6))
+        self.latest = np.ndarray((1,), np.int64, buf, 8 * (4 * n * d + 8))
+
+    # Shares the frame with another process by the name of its memory block instead of copying the arrays
+    def __getstate__(self):
+        return (self.shm.name, self.count, self.dim)
+
+    def __setstate__(self, state):
+        name, self.count, self.dim = state
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = None
+        self.views()
+
+    # Writes the state of a world into the back buffer and then makes it the latest frame
+    def write(self, world, steps=0, rate=0):
+        back = 1 - int(self.latest[0])
+        self.seq[back] += 1
+        self.pos[back] = world.pos
+        self.vel[back] = world.vel
+        self.info[back] = (world.totalKE(), steps, rate)
+        self.seq[back] += 1
+        self.latest[0] = back
+
+    # Returns a copy of the latest complete frame, retrying if the writer reused the buffer while it was copied
+    def read(self, mass, radius):
+        while True:
+            slot = int(self.latest[0])
+            before = int(self.seq[slot])
+            if before % 2:
+                continue
+            pos = self.pos[slot].copy()
+            vel = self.vel[slot].copy()
+            total_ke, steps, rate = self.info[slot].tolist()
+            if int(self.seq[slot]) == before:
+                return Snapshot(pos, vel, mass, radius, total_ke, int(steps), rate)
+
+    # Releases the shared memory and frees it if this process created it
+    def close(self):
+        self.pos = self.vel = self.info = self.seq = self.latest = None
+        self.shm.close()
+        if self.owner == os.getpid():
+            self.shm.unlink()
+
+
+
+
+
+# Applies the held tool (a name and arguments from ACTIONS, or None) to a world for a step of dt
+def applyHeld(world, held, dt):
+    if held is not None:
+        name, args = held
+        ACTIONS[name](world, *args, dt=dt)
+
+# Runs in the physics process, stepping the world by dt and publishing every step to the shared frame
+# Steps are paced so the simulation advances speed time units per second, or as fast as possible when speed is None
+# When record is given it is called with the world to make a Recorder in this process, which is handed every step
+def simulate(world, frame, actions, stop, speed, dt, record=None):
+    recorder = record(world) if record else None
+    if recorder:
+        recorder.record(world)
+    steps = 0
+    rate = 0
+    count = 0
+    held = None
+    start = time.perf_counter()
+    next_step = start
+    while not stop.is_set():
+        # Apply any actions sent by the viewer since the last step and the tool that is held down
+        while True:
+            try:
+                name, args = actions.get_nowait()
+            except queue.Empty:
+                break
+            if name == "hold":
+                held = args
+            else:
+                ACTIONS[name](world, *args)
+        applyHeld(world, held, dt)
+
+        world.step(dt)
+        if recorder:
+            recorder.record(world)
+        steps += 1
+        count += 1
+        now = time.perf_counter()
+        if now - start >= 1:
+            rate = count / (now - start)
+            count = 0
+            start = now
+        frame.write(world, steps, rate)
+
+        # Wait until the next step is due when the physics rate is capped
+        if speed:
+            next_step = max(next_step + dt / speed, now - 1)
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    if recorder:
+        recorder.close()
+    frame.close()
+
+
+
+
+
+class SimProcess:
+    # Initialize a simulation that steps a world in a separate process and publishes its frames to shared memory
+    # The world advances speed time units per real second in steps of dt, or as fast as possible when speed is None
+    # record makes a Recorder for the world (for example functools.partial(Recorder, path)) which records from inside the physics process
+    def __init__(self, world, speed=60, dt=1, record=None):
+        self.mass = world.mass.copy()
+        self.radius = world.radius.copy()
+        self.frame = SharedFrame(len(world), world.pos.shape[1])
+        self.frame.write(world)
+        self.frame.write(world)
+        self.actions = multiprocessing.Queue()
+        self.held = None
+        self.stop = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=simulate, args=(world, self.frame, self.actions, self.stop, speed, dt, record), daemon=True)
+        self.process.start()
+
+    # Sends an action such as "save" to be applied once before the next step
+    def send(self, name, *args):
+        self.actions.put((name, args))
+
+    # Holds down a tool such as "click", "space", or "heat" so it is applied before every step until another tool (or None) is held
+    # Only changes are sent, so the viewer can call this every frame
+    def hold(self, name, *args):
+        held = None if name is None else (name, args)
+        if held != self.held:
+            self.held = held
+            self.actions.put(("hold", held))
+
+    # Returns a snapshot of the latest complete frame (the physics process keeps its own time so elapsed is not needed)
+    def latest(self, elapsed=0):
+        return self.frame.read(self.mass, self.radius)
+
+    # Stops the physics process, which closes its recorder, and frees the shared frame
+    def close(self):
+        self.stop.set()
+        self.process.join()
+        self.frame.close()
+
+
+
+
+
+class LocalSim:
+    # Initialize a simulation that steps a world in this process with the same interface as SimProcess
+    # Simulated time builds up at speed time units per real second and is used up in fixed steps of dt so
+    # results do not depend on the frame rate, with at most max_steps steps per frame to keep slow frames from snowballing
+    # record makes a Recorder for the world like for SimProcess, which is handed every step rather than only the drawn ones
+    def __init__(self, world, speed=60, dt=1, max_steps=4, record=None):
+        self.world = world
+        self.recorder = record(world) if record else None
+        if self.recorder:
+            self.recorder.record(world)
+        self.speed = speed
+        self.dt = dt
+        self.max_steps = max_steps
+        self.time = 0
+        self.held = None
+
+    # Applies an action such as "save" right away
+    def send(self, name, *args):
+        ACTIONS[name](self.world, *args)
+
+    # Holds down a tool such as "click", "space", or "heat" so it is applied before every step until another tool (or None) is held
+    def hold(self, name, *args):
+        self.held = None if name is None else (name, args)
+
+    # Steps the world for the real time that has elapsed since the last frame in seconds and returns it
+    def latest(self, elapsed):
+        self.time += elapsed * self.speed
+        steps = min(int(self.time // self.dt), self.max_steps)
+        for _ in range(steps):
+            applyHeld(self.world, self.held, self.dt)
+            self.world.step(self.dt)
+            if self.recorder:
+                self.recorder.record(self.world)
+        self.time = 0 if steps == self.max_steps else self.time - steps * self.dt
+        return self.world
+
+    # Closes the recorder since nothing else needs to be stopped when simulating in this process
+    def close(self):
+        if self.recorder:
+            self.recorder.close()
@@ -0,0 +1,47 @@
+import numpy as np
+from Broadphase import withinRadius
+
+# Returns the total kinetic energy of particles with masses mass and velocities vel
+def kineticEnergy(mass, vel):
+    return 0.5 * float(np.dot(mass, np.einsum("ij,ij->i", vel, vel)))
+
+# Returns the indices of the particles within radius of pos, found from the spatial index of the world when it has one
+# so tools only cost as much as the particles they touch
+def particlesNear(world, pos, radius):
+    query = getattr(world, "queryRadius", None)
+    if query is None:
+        return withinRadius(world.pos, pos, radius)
+    return query(pos, radius)
+
+# Increases the speed of all particles within a certain radius of the click
+# Tools held down are applied once per step and dt scales their effect to the simulated time the step covers
+def handleClick(world, pos, radius=70, dt=1):
+    near = particlesNear(world, pos, radius)
+    vel = world.vel[near]
+    speed = np.linalg.norm(vel, axis=1, keepdims=True)
+    world.vel[near] += 6 * dt * np.divide(vel, speed, out=np.zeros_like(vel), where=speed > 0)
+    world.addKE(kineticEnergy(world.mass[near], world.vel[near]) - kineticEnergy(world.mass[near], vel))
+
+# Pulls every particle towards the mouse with a strength that falls off with distance
+# The pull adds up over the steps it is held so far particles still drift in, and only passing a radius limits it to the particles within it
+def handleSpace(world, pos, radius=None, dt=1):
+    near = np.arange(len(world.pos)) if radius is None else particlesNear(world, pos, radius)
+    vel = world.vel[near]
+    diff = world.pos[near] - pos
+    dist = np.linalg.norm(diff, axis=1, keepdims=True)
+    # Particles exactly on the mouse have no direction to be pulled in
+    safe = np.where(dist > 0, dist, 1)
+    scalar = np.minimum(300, 80 / safe) * dt
+    world.vel[near] -= np.where(dist > 0, diff / safe * scalar, 0)
+    world.addKE(kineticEnergy(world.mass[near], world.vel[near]) - kineticEnergy(world.mass[near], vel))
+
+# Slowly increases the velocity of all particles (or only the ones within radius of pos) by scaling by a constant factor
+def heat(world, pos=None, radius=70, dt=1):
+    factor = 1.02 ** dt
+    if pos is None:
+        world.vel *= factor
+        world.addKE((factor ** 2 - 1) * world.totalKE())
+        return
+    near = particlesNear(world, pos, radius)
+    world.vel[near] *= factor
+    world.addKE((factor ** 2 - 1) * kineticEnergy(world.mass[near], world.vel[near]) / factor ** 2)
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 class Vector2D:
     # Initialize a new Vector with an x and y component
@@ -8,11 +9,11 @@ class Vector2D:
     
     # Returns a new Vector that is the sum of self and other
     def __add__(self, other):
-        return Vector(self.x + other.x, self.y + other.y)
+        return Vector2D(self.x + other.x, self.y + other.y)
     
     # Returns a new Vector that is the difference of self and other
     def __sub__(self, other):
-        return Vector(self.x - other.x, self.y - other.y)
+        return Vector2D(self.x - other.x, self.y - other.y)
     
     # Returns the dot product of two vectors
     def __mul__(self, other):
@@ -24,7 +25,7 @@ class Vector2D:
     
     # Returns a scaled vector by multiplying the x and y values by a scalar
     def scale(self, scalar):
-        return Vector(self.x * scalar, self.y * scalar)
+        return Vector2D(self.x * scalar, self.y * scalar)
     
     # Returns the magnitude of the vector using cartesian distance
     def mag(self):
@@ -37,13 +38,13 @@ class Vector2D:
     # Returns a unit vector pointing in the same direction as the original
     def norm(self):
         if self.mag() == 0:
-            return Vector(0, 0)
+            return Vector2D(0, 0)
         return self.scale(1 / self.mag())
     
     # Returns a projection of the self onto another vector
     def proj(self, other):
         if other.mag() == 0:
-            return Vector(0, 0)
+            return Vector2D(0, 0)
         return other.scale((self * other) / other.magSQ())
     
     # Returns the cartesian distance between two vectors
@@ -175,18 +176,294 @@ class Vector:
     # Returns a projection of the vector into 1 dimension lower
     def red(self):
         return Vector([self.els[i] for i in range(len(self.els) - 1)])
+
+    # Checks if the distance to another vector is less than dist without taking a square root
+    def within(self, other, dist):
+        return self.distSQ(other) < dist * dist
+
+    # Scales the vector by a scalar in place and returns it
+    def scale_(self, scalar):
+        self.els = [el * scalar for el in self.els]
+        return self
+
+    # Adds another vector times a scalar to the vector in place and returns it
+    def addScaled_(self, other, scalar):
+        self.els = [a + b * scalar for a, b in zip(self.els, other.els)]
+        return self
     
 
 
 
 
+
+class Vector2:
+    # Only the two components are stored so vectors are small and fast to create
+    __slots__ = ("_x", "_y")
+
+    # Initialize a new 2D vector with an x and y component
+    def __init__(self, x=0.0, y=0.0):
+        self._x = x
+        self._y = y
+
+    # Returns a new Vector that is the sum of self and other
+    def __add__(self, other):
+        return Vector2(self._x + other._x, self._y + other._y)
+
+    # Returns a new Vector that is the difference of self and other
+    def __sub__(self, other):
+        return Vector2(self._x - other._x, self._y - other._y)
+
+    # Adds other to the vector in place
+    def __iadd__(self, other):
+        self._x += other._x
+        self._y += other._y
+        return self
+
+    # Subtracts other from the vector in place
+    def __isub__(self, other):
+        self._x -= other._x
+        self._y -= other._y
+        return self
+
+    # Returns the dot product of two vectors
+    def __mul__(self, other):
+        return self._x * other._x + self._y * other._y
+
+    # Checks if two vectors are equal by comparing their respective x and y values
+    def __eq__(self, other):
+        return self._x == other._x and self._y == other._y
+
+    # Returns a scaled vector by multiplying the x and y values by a scalar
+    def scale(self, scalar):
+        return Vector2(self._x * scalar, self._y * scalar)
+
+    # Scales the vector by a scalar in place and returns it
+    def scale_(self, scalar):
+        self._x *= scalar
+        self._y *= scalar
+        return self
+
+    # Adds another vector times a scalar to the vector in place and returns it
+    def addScaled_(self, other, scalar):
+        self._x += other._x * scalar
+        self._y += other._y * scalar
+        return self
+
+    # Returns the magnitude of the vector using cartesian distance
+    def mag(self):
+        return (self._x * self._x + self._y * self._y) ** 0.5
+
+    # Returns the square of the magnitude of the vector
+    def magSQ(self):
+        return self._x * self._x + self._y * self._y
+
+    # Returns a unit vector pointing in the same direction as the original
+    def norm(self):
+        mag = self.mag()
+        if mag == 0:
+            return Vector2()
+        return Vector2(self._x / mag, self._y / mag)
+
+    # Returns a projection of the self onto another vector
+    def proj(self, other):
+        mag_sq = other.magSQ()
+        if mag_sq == 0:
+            return Vector2()
+        return other.scale((self._x * other._x + self._y * other._y) / mag_sq)
+
+    # Returns the cartesian distance between two vectors
+    def dist(self, other):
+        return self.distSQ(other) ** 0.5
+
+    # Returns the distance between two vectors squared
+    def distSQ(self, other):
+        dx = other._x - self._x
+        dy = other._y - self._y
+        return dx * dx + dy * dy
+
+    # Checks if the distance to another vector is less than dist without taking a square root
+    def within(self, other, dist):
+        dx = other._x - self._x
+        dy = other._y - self._y
+        return dx * dx + dy * dy < dist * dist
+
+    # Returns a string representation of the vector in the form (x, y)
+    def __str__(self):
+        return f"({self._x}, {self._y})"
+
+    # Returns the components as a list like the els of a Vector so matrices can multiply it
+    @property
+    def els(self):
+        return [self._x, self._y]
+
+    # Returns the x value of the vector
+    def x(self):
+        return self._x
+
+    # Returns the y value of the vector
+    def y(self):
+        return self._y
+
+    # Sets the x value of the vector
+    def setX(self, val):
+        self._x = val
+
+    # Sets the y value of the vector
+    def setY(self, val):
+        self._y = val
+
+
+
+
+
+class Vector3:
+    # Only the three components are stored so vectors are small and fast to create
+    __slots__ = ("_x", "_y", "_z")
+
+    # Initialize a new 3D vector with an x, y, and z component
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self._x = x
+        self._y = y
+        self._z = z
+
+    # Returns a new Vector that is the sum of self and other
+    def __add__(self, other):
+        return Vector3(self._x + other._x, self._y + other._y, self._z + other._z)
+
+    # Returns a new Vector that is the difference of self and other
+    def __sub__(self, other):
+        return Vector3(self._x - other._x, self._y - other._y, self._z - other._z)
+
+    # Adds other to the vector in place
+    def __iadd__(self, other):
+        self._x += other._x
+        self._y += other._y
+        self._z += other._z
+        return self
+
+    # Subtracts other from the vector in place
+    def __isub__(self, other):
+        self._x -= other._x
+        self._y -= other._y
+        self._z -= other._z
+        return self
+
+    # Returns the dot product of two vectors
+    def __mul__(self, other):
+        return self._x * other._x + self._y * other._y + self._z * other._z
+
+    # Checks if two vectors are equal by comparing their respective x, y, and z values
+    def __eq__(self, other):
+        return self._x == other._x and self._y == other._y and self._z == other._z
+
+    # Returns a scaled vector by multiplying the x, y, and z values by a scalar
+    def scale(self, scalar):
+        return Vector3(self._x * scalar, self._y * scalar, self._z * scalar)
+
+    # Scales the vector by a scalar in place and returns it
+    def scale_(self, scalar):
+        self._x *= scalar
+        self._y *= scalar
+        self._z *= scalar
+        return self
+
+    # Adds another vector times a scalar to the vector in place and returns it
+    def addScaled_(self, other, scalar):
+        self._x += other._x * scalar
+        self._y += other._y * scalar
+        self._z += other._z * scalar
+        return self
+
+    # Returns the magnitude of the vector using cartesian distance
+    def mag(self):
+        return (self._x * self._x + self._y * self._y + self._z * self._z) ** 0.5
+
+    # Returns the square of the magnitude of the vector
+    def magSQ(self):
+        return self._x * self._x + self._y * self._y + self._z * self._z
+
+    # Returns a unit vector pointing in the same direction as the original
+    def norm(self):
+        mag = self.mag()
+        if mag == 0:
+            return Vector3()
+        return Vector3(self._x / mag, self._y / mag, self._z / mag)
+
+    # Returns a projection of the self onto another vector
+    def proj(self, other):
+        mag_sq = other.magSQ()
+        if mag_sq == 0:
+            return Vector3()
+        return other.scale((self._x * other._x + self._y * other._y + self._z * other._z) / mag_sq)
+
+    # Returns the cartesian distance between two vectors
+    def dist(self, other):
+        return self.distSQ(other) ** 0.5
+
+    # Returns the distance between two vectors squared
+    def distSQ(self, other):
+        dx = other._x - self._x
+        dy = other._y - self._y
+        dz = other._z - self._z
+        return dx * dx + dy * dy + dz * dz
+
+    # Checks if the distance to another vector is less than dist without taking a square root
+    def within(self, other, dist):
+        dx = other._x - self._x
+        dy = other._y - self._y
+        dz = other._z - self._z
+        return dx * dx + dy * dy + dz * dz < dist * dist
+
+    # Returns a string representation of the vector in the form (x, y, z)
+    def __str__(self):
+        return f"({self._x}, {self._y}, {self._z})"
+
+    # Returns the components as a list like the els of a Vector so matrices can multiply it
+    @property
+    def els(self):
+        return [self._x, self._y, self._z]
+
+    # Returns the x value of the vector
+    def x(self):
+        return self._x
+
+    # Returns the y value of the vector
+    def y(self):
+        return self._y
+
+    # Returns the z value of the vector
+    def z(self):
+        return self._z
+
+    # Sets the x value of the vector
+    def setX(self, val):
+        self._x = val
+
+    # Sets the y value of the vector
+    def setY(self, val):
+        self._y = val
+
+    # Sets the z value of the vector
+    def setZ(self, val):
+        self._z = val
+
+    # Returns a projection of the vector into 1 dimension lower
+    def red(self):
+        return Vector2(self._x, self._y)
+
+
+
+
+
 class Matrix:
     # Creates a new matrix from a list of column vectors
-    def __init__(self, cols):
+    # The row vectors can be passed in when they are already known so they do not have to be generated again
+    def __init__(self, cols, rows=None):
         self.cols = cols
-        self.rows = self.getRows()
+        self.rows = rows if rows is not None else self.getRows()
         self.m = len(self.rows)
         self.n = len(self.cols)
+        self.values = None
     
     # Generates the rows of a matrix from its column vectors
     def getRows(self):
@@ -218,16 +495,33 @@ class Matrix:
         if len(vector.els) != self.n:
             return None
         return Vector([r * vector for r in self.rows])
+
+    # Returns the matrix as an m x n NumPy array, which is only built the first time it is needed
+    def array(self):
+        if self.values is None:
+            self.values = np.array([r.els for r in self.rows], dtype=np.float64)
+        return self.values
+
+    # Returns the result of multiplying the matrix by every point in an N x n array at once as an N x m array
+    def apply(self, points):
+        points = np.asarray(points, dtype=np.float64)
+        if points.shape[-1] != self.n:
+            return None
+        return points @ self.array().T
         
     # Returns the product of two matrices
+    # Every entry is a dot product of a row and a column, so the rows and columns of the product are both built from one table
     def __mul__(self, other):
         if self.n != other.m:
             return None
-        return Matrix([self.mult(c) for c in other.cols])
+        table = [[r * c for c in other.cols] for r in self.rows]
+        rows = [Vector(row) for row in table]
+        cols = [Vector([row[c] for row in table]) for c in range(other.n)]
+        return Matrix(cols, rows)
 
     # Returns the transpose of the matrix
     def transpose(self):
-        return Matrix(self.rows)
+        return Matrix(self.rows, self.cols)
     
     # Returns a scaled version of the matrix
     def scale(self, scalar):
@@ -289,6 +583,14 @@ class Quaternion:
             z = self.z / mag
         )
     
+    def toMatrix(self):
+        # Rotation matrix of this (unit) quaternion, which rotates vectors the same way as mult
+        w, x, y, z = self.w, self.x, self.y, self.z
+        c1 = Vector([1 - 2*(y*y + z*z), 2*(x*y + w*z), 2*(x*z - w*y)])
+        c2 = Vector([2*(x*y - w*z), 1 - 2*(x*x + z*z), 2*(y*z + w*x)])
+        c3 = Vector([2*(x*z + w*y), 2*(y*z - w*x), 1 - 2*(x*x + y*y)])
+        return Matrix([c1, c2, c3])
+    
     def mult(self, v):
         # Rotate vector v using this quaternion
         q_v = Quaternion(0, v.x(), v.y(), v.z())
@@ -0,0 +1,95 @@
+import functools, argparse
+from World import randomWorld
+from Broadphase import makeBroadphase
+from EventWorld import EventWorld
+from SimProcess import SimProcess, LocalSim
+from Checkpoint import loadCheckpoint
+from Recorder import Recorder, Trajectory, Replay
+from Profiler import Profiler
+from BarnesHut import BarnesHut
+from PairPotential import PairPotential
+
+# Returns a parser with the command line options shared by particles.py and particles3D.py
+# Each viewer can add its own options before calling parseViewerArgs
+def viewerParser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--broadphase", choices=["grid", "sweep"], default="grid", help="method used to find colliding pairs")
+    parser.add_argument("--engine", choices=["step", "event"], default="step", help="fixed steps or exact event driven collisions")
+    parser.add_argument("--process", action="store_true", help="run the physics in a separate process from the drawing")
+    parser.add_argument("--speed", type=float, default=60, help="simulated time units per second (a particle moves its velocity once per time unit)")
+    parser.add_argument("--dt", type=float, default=1, help="simulated time per physics step, which is split into substeps for fast particles")
+    parser.add_argument("--panel-fps", type=float, default=10, help="how many times per second the graphs are redrawn")
+    parser.add_argument("--hist-every", type=int, default=1, help="only bin the particle speeds every k panel updates")
+    parser.add_argument("--hist-sample", type=int, default=None, help="bin the speeds of a random sample of this many particles")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the initial conditions")
+    parser.add_argument("--load", default=None, help="checkpoint file to start from instead of random particles")
+    parser.add_argument("--save", default="checkpoint.sim", help="checkpoint file written when S is pressed")
+    parser.add_argument("--record", default=None, help="trajectory file to stream the positions and velocities of every step to")
+    parser.add_argument("--record-every", type=int, default=1, help="only record a frame every k simulation steps")
+    parser.add_argument("--record-dtype", choices=["float16", "float32", "float64"], default="float32", help="precision of the recorded positions and velocities")
+    parser.add_argument("--replay", default=None, help="trajectory file to play back instead of simulating")
+    parser.add_argument("--replay-fps", type=float, default=60, help="recorded frames played per second (negative plays backwards)")
+    parser.add_argument("--frame", type=int, default=0, help="index of the recorded frame to start playing from")
+    parser.add_argument("--profile", action="store_true", help="start with the timing overlay shown (P toggles it)")
+    parser.add_argument("--profile-csv", default=None, help="CSV file to write the timings and counts of every frame to")
+    parser.add_argument("--gravity", type=float, default=0, help="strength of a Barnes-Hut long range force between all particles (negative repels)")
+    parser.add_argument("--theta", type=float, default=0.5, help="opening angle of the Barnes-Hut tree (smaller is more accurate)")
+    parser.add_argument("--potential", choices=["soft", "lj"], default=None, help="short range pair potential (soft spheres replace hard collisions)")
+    parser.add_argument("--epsilon", type=float, default=None, help="strength of the pair potential")
+    return parser
+
+# Parses the command line and exits with a usage error for options that cannot be combined
+def parseViewerArgs(parser):
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record cannot be used with --replay")
+    if (args.gravity or args.potential) and args.engine != "step":
+        parser.error("--gravity and --potential only work with the step engine")
+    return args
+
+# Returns the simulation a viewer draws from and its kinetic energy history (None unless restored from a checkpoint)
+# The simulation plays back a trajectory with --replay, and otherwise steps a world loaded from a checkpoint or made by randomWorld
+# in a box split into the given number of cells, with the rest of the arguments passed on to randomWorld
+# Exits with a usage error when the trajectory or checkpoint has a different number of dimensions than the box
+def makeViewerSim(parser, args, box, cells, count, mass, speed, friction, radius_factor, margin):
+    dim = len(box)
+    if args.replay:
+        # Play back a recorded trajectory instead of simulating
+        trajectory = Trajectory(args.replay)
+        if trajectory.dim != dim:
+            parser.error(f"{args.replay} is not a {dim}D trajectory")
+        return Replay(trajectory, args.replay_fps, args.frame), None
+
+    # Create particles (or restore them and their kinetic energy history from a checkpoint)
+    broadphase = makeBroadphase(args.broadphase, box, cells)
+    ke_graph = None
+    if args.load:
+        world, ke_graph = loadCheckpoint(args.load, broadphase=broadphase)
+        if world.dim != dim:
+            parser.error(f"{args.load} is not a {dim}D checkpoint")
+    else:
+        world = randomWorld(count, box, mass, speed, friction, radius_factor, margin=margin, seed=args.seed, broadphase=broadphase)
+    if args.gravity:
+        world.forces.append(BarnesHut(args.gravity, args.theta))
+    if args.potential:
+        world.forces.append(PairPotential(args.potential, args.epsilon))
+        world.hard = args.potential != "soft"
+    if args.engine == "event":
+        world = EventWorld.fromWorld(world)
+    # Every step is recorded from inside the loop that takes it, so frames are evenly spaced in simulated time
+    record = None
+    if args.record:
+        record = functools.partial(Recorder, args.record, dtype=args.record_dtype, every=args.record_every)
+    # Step the particles in this process or in a separate physics process that publishes frames to shared memory
+    if args.process:
+        return SimProcess(world, args.speed, args.dt, record=record), ke_graph
+    return LocalSim(world, args.speed, args.dt, record=record), ke_graph
+
+# Returns the profiler timing each phase of the frame, which only costs anything while the overlay is shown or a CSV file is written
+# The physics process is not timed, so with --process the physics phase is only the time to copy the latest frame
+def makeViewerProfiler(args, sim):
+    profiler = Profiler(path=args.profile_csv)
+    profiler.enabled = args.profile or args.profile_csv is not None
+    if not args.process and not args.replay:
+        sim.world.profiler = profiler
+    return profiler
@@ -0,0 +1,294 @@
+import math
+import numpy as np
+from Broadphase import CellGrid, withinRadius, withinBox
+
+# Splits the pairs i[k] and j[k] into batches in which no particle appears twice and returns the pair indices of each batch
+# Each batch takes every pair it can, so a pair is only left for a later batch when one of its particles is already in this one,
+# which makes fewer than twice as many batches as the most pairs any one particle is in, however the pairs are chained together
+# Pairs are picked in a shuffled (but fixed) order so a long chain of touching particles fills a batch in a few passes,
+# and resolving the batches one after another is the same as resolving the pairs one at a time in the order of the batches
+def colorPairs(i, j):
+    count = int(max(i.max(), j.max())) + 1 if len(i) else 0
+    remaining = np.random.default_rng(0).permutation(len(i))
+    batches = []
+    while len(remaining):
+        used = np.zeros(count, dtype=bool)
+        chosen = []
+        candidates = remaining
+        while len(candidates):
+            # A candidate joins the batch when it is the first candidate of both of its particles
+            a, b = i[candidates], j[candidates]
+            rank = np.arange(len(candidates))
+            first = np.full(count, len(candidates))
+            np.minimum.at(first, a, rank)
+            np.minimum.at(first, b, rank)
+            free = (first[a] == rank) & (first[b] == rank)
+            picked = candidates[free]
+            chosen.append(picked)
+            used[i[picked]] = True
+            used[j[picked]] = True
+            candidates = candidates[~free]
+            candidates = candidates[~(used[i[candidates]] | used[j[candidates]])]
+        batch = np.concatenate(chosen)
+        batches.append(batch)
+        taken = np.zeros(len(i), dtype=bool)
+        taken[batch] = True
+        remaining = remaining[~taken[remaining]]
+    return batches
+
+# Handles elastic collisions between the particles a[k] and b[k] at once with the same rules as Particle.collide
+# No particle can appear twice in a batch, and pairs that are no longer touching are skipped
+# Returns the number of collisions
+def resolveBatch(pos, vel, mass, radius, a, b, damping=1):
+    # Check if the two particles are still colliding after the batches before them
+    diff = pos[b] - pos[a]
+    dist_sq = np.einsum("ij,ij->i", diff, diff)
+    rsum = radius[a] + radius[b]
+    hit = dist_sq < rsum * rsum
+    a, b, diff, dist_sq, rsum = a[hit], b[hit], diff[hit], dist_sq[hit], rsum[hit]
+    pa, pb, va, vb = pos[a], pos[b], vel[a], vel[b]
+
+    # Make overlapping particles just barely touch (particles at exactly the same spot are left where they are)
+    dist = np.sqrt(dist_sq)
+    moving = dist > 0
+    push = np.divide(0.5 * (rsum - dist), dist, out=np.zeros_like(dist), where=moving)[:, None]
+    pb = pb + diff * push
+    pa = pa - diff * push
+    diff = pb - pa
+    dist_sq = np.einsum("ij,ij->i", diff, diff)
+
+    # Adjust both velocities along the line between the particles based on conservation of momentum
+    vel_diff = vb - va
+    s = np.divide(np.einsum("ij,ij->i", vel_diff, diff), dist_sq, out=np.zeros_like(dist_sq), where=moving)
+    total = mass[a] + mass[b]
+    va = va + diff * (s * 2 * mass[b] / total)[:, None]
+    vb = vb - diff * (s * 2 * mass[a] / total)[:, None]
+
+    # Dampen particle velocities to simulate friction
+    pos[a] = pa
+    pos[b] = pb
+    vel[a] = va * damping
+    vel[b] = vb * damping
+    return len(a)
+
+# Checks for and handles elastic collisions between the candidate pairs of particles i[k] and j[k] with optional damping
+# Overlapping pairs are resolved as if one at a time with the same rules as Particle.collide, but in conflict free
+# batches from colorPairs that are each handled with one vectorized update
+# Returns the number of collisions, the change in total kinetic energy they caused, and the farthest any particle was pushed
+def resolvePairs(pos, vel, mass, radius, i, j, damping=1):
+    # Only keep the pairs that are actually overlapping (pairs pushed into contact by earlier pairs are handled next step)
+    diff = pos[j] - pos[i]
+    reach = radius[i] + radius[j]
+    hit = np.einsum("ij,ij->i", diff, diff) < reach ** 2
+    i = i[hit]
+    j = j[hit]
+    if len(i) == 0:
+        return 0, 0.0, 0.0
+
+    involved = np.unique(np.concatenate((i, j)))
+    start = pos[involved]
+    before = 0.5 * float(np.dot(mass[involved], np.einsum("ij,ij->i", vel[involved], vel[involved])))
+    count = 0
+    for batch in colorPairs(i, j):
+        count += resolveBatch(pos, vel, mass, radius, i[batch], j[batch], damping)
+    after = 0.5 * float(np.dot(mass[involved], np.einsum("ij,ij->i", vel[involved], vel[involved])))
+    moved = pos[involved] - start
+    return count, after - before, math.sqrt(float(np.einsum("ij,ij->i", moved, moved).max()))
+
+# Checks for and handles elastic collisions with the walls on every axis with optional damping
+# When the masses are given the change in total kinetic energy from the damping is returned
+def checkWalls(pos, vel, radius, box, damping=1, mass=None):
+    change = 0.0
+    for axis in range(pos.shape[1]):
+        coord = pos[:, axis]
+        # Check the low wall first and only check the high wall for particles that missed it
+        low = coord - radius < 0
+        high = ~low & (coord + radius > box[axis])
+        hit = low | high
+        if not hit.any():
+            continue
+        # Reflect the velocity, clamp the particle inside the wall, and dampen its velocity
+        vel[hit, axis] *= -1
+        coord[low] = radius[low]
+        coord[high] = box[axis] - radius[high]
+        if mass is not None and damping != 1:
+            change += 0.5 * (damping ** 2 - 1) * float(np.dot(mass[hit], np.einsum("ij,ij->i", vel[hit], vel[hit])))
+        vel[hit] *= damping
+    return change
+
+# Returns how many substeps a step of dt needs so no particle moves further than cfl times the smallest radius in one substep
+# With cfl at most 1 two particles can never pass through each other between collision checks
+def substeps(vel, radius, dt=1, cfl=1, max_substeps=64):
+    if len(vel) == 0:
+        return 1
+    speed = math.sqrt(float(np.einsum("ij,ij->i", vel, vel).max()))
+    return max(1, min(max_substeps, math.ceil(speed * dt / (cfl * float(radius.min())))))
+
+
+
+
+
+class World:
+    # Initialize a world of particles stored as contiguous arrays of masses, positions, and velocities
+    # box holds the size of the simulation field along each axis and radius_factor converts mass to radius
+    # broadphase finds candidate pairs for collisions and defaults to a grid with cells as wide as the largest particle
+    # cfl limits how far the fastest particle can move in one substep as a fraction of the smallest radius
+    # The total kinetic energy is kept up to date from the changes made by each collision and is recomputed from scratch every resync steps
+    # rng is the random number generator of the world, which is saved with it in checkpoints
+    # forces are models like BarnesHut or PairPotential whose accelerations(world) are applied to the velocities
+    # hard makes touching particles bounce off each other, which can be turned off when a pair potential keeps them apart instead
+    def __init__(self, mass, pos, vel, box, friction=1, radius_factor=1/3, broadphase=None, cfl=1, max_substeps=64, resync=100, rng=None,
+                 forces=(), hard=True):
+        self.pos = np.ascontiguousarray(pos, dtype=np.float64)
+        self.vel = np.ascontiguousarray(vel, dtype=np.float64)
+        self.mass = np.ascontiguousarray(np.broadcast_to(mass, len(self.pos)), dtype=np.float64)
+        self.radius = self.mass * radius_factor
+        self.box = np.asarray(box, dtype=np.float64)
+        self.friction = friction
+        self.dim = self.pos.shape[1]
+        if broadphase is None:
+            broadphase = CellGrid.sized(self.box, 2 * self.radius.max())
+        self.broadphase = broadphase
+        self.cfl = cfl
+        self.max_substeps = max_substeps
+        self.substeps = 1
+        self.candidates = 0
+        self.collisions = 0
+        self.list_builds = 0
+        self.resync = resync
+        self.steps = 0
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.forces = list(forces)
+        self.hard = hard
+        # The farthest any particle was pushed by collisions since the grid of the broad phase last binned the particles
+        self.drift = 0.0
+        # A Profiler set here times the update, pair finding, and collision phases of every substep
+        self.profiler = None
+        self.recomputeKE()
+
+    # Returns the number of particles in the world
+    def __len__(self):
+        return len(self.pos)
+
+    # Get the momentum of every particle based on its mass and velocity
+    def mom(self):
+        return self.vel * self.mass[:, None]
+
+    # Get the kinetic energy of every particle based on its mass and velocity
+    def ke(self):
+        return 0.5 * self.mass * np.einsum("ij,ij->i", self.vel, self.vel)
+
+    # Get the total kinetic energy of the system
+    def totalKE(self):
+        return self.total_ke
+
+    # Recomputes the total kinetic energy from every particle to correct drift in the running total
+    def recomputeKE(self):
+        self.total_ke = float(self.ke().sum())
+        return self.total_ke
+
+    # Adds a change in kinetic energy made from outside the world (for example by heating) to the running total
+    def addKE(self, change):
+        self.total_ke += change
+
+    # Returns the indices of the particles whose centers are within radius of center
+    # The grid of the broad phase is used to only look near the center, but it is only binned every step while hard collisions use it
+    def queryRadius(self, center, radius):
+        query = getattr(self.broadphase, "queryRadius", None)
+        if query is None or not self.hard:
+            return withinRadius(self.pos, center, radius)
+        return query(self.pos, center, radius, self.drift)
+
+    # Returns the indices of the particles whose centers are inside the box from low to high, using the grid like queryRadius
+    def queryBox(self, low, high):
+        query = getattr(self.broadphase, "queryBox", None)
+        if query is None or not self.hard:
+            return withinBox(self.pos, low, high)
+        return query(self.pos, low, high, self.drift)
+
+    # Changes the velocities by the accelerations from some forces over a time of dt and adds the change in kinetic energy
+    def accelerate(self, forces, dt=1):
+        before = float(self.ke().sum())
+        for force in forces:
+            self.vel += force.accelerations(self) * dt
+        self.total_ke += float(self.ke().sum()) - before
+
+    # Update positions based on velocities over a time of dt and handle wall collisions for every particle at once
+    def update(self, dt=1):
+        self.pos += self.vel * dt
+        self.checkWalls()
+
+    # Checks for and handles elastic collisions with the walls on every axis with optional damping
+    def checkWalls(self):
+        self.total_ke += checkWalls(self.pos, self.vel, self.radius, self.box, self.friction, self.mass)
+
+    # Checks for and handles collisions between the candidate pairs i[k] and j[k]
+    # Returns the number of collisions
+    def collide(self, i, j):
+        count, change, self.drift = resolvePairs(self.pos, self.vel, self.mass, self.radius, i, j, self.friction)
+        self.total_ke += change
+        return count
+
+    # Advance the whole system by a time of dt (one frame of the original simulation when dt is 1)
+    # Long range forces change the velocities once for the whole step before the particles move and collide,
+    # and the step is split into enough substeps that fast particles cannot skip past each other and short range forces stay stable
+    def step(self, dt=1):
+        profiler = self.profiler
+        long_range = [force for force in self.forces if not force.substep]
+        short_range = [force for force in self.forces if force.substep]
+        if long_range:
+            if profiler:
+                start = profiler.now()
+            self.accelerate(long_range, dt)
+            if profiler:
+                profiler.lap("forces", start)
+        self.substeps = substeps(self.vel, self.radius, dt, self.cfl, self.max_substeps)
+        for force in short_range:
+            self.substeps = min(self.max_substeps, max(self.substeps, math.ceil(dt / force.maxStep(self))))
+        # Neighbour lists of short range forces whose rebuilds are counted
+        lists = [force.neighbours for force in short_range if hasattr(force, "neighbours")]
+        builds = sum(neighbours.builds for neighbours in lists)
+        self.candidates = 0
+        self.collisions = 0
+        for _ in range(self.substeps):
+            if profiler:
+                start = profiler.now()
+            if short_range:
+                self.accelerate(short_range, dt / self.substeps)
+                if profiler:
+                    start = profiler.lap("forces", start)
+            self.update(dt / self.substeps)
+            if profiler:
+                start = profiler.lap("update", start)
+            if not self.hard:
+                continue
+            if profiler:
+                keys = getattr(self.broadphase, "keys", None)
+            i, j = self.broadphase.pairs(self.pos, self.radius)
+            if profiler:
+                start = profiler.lap("pairs", start)
+                # Particles that moved to a different cell of the grid since the last substep
+                if keys is not None and len(keys) == len(self.pos):
+                    profiler.count("zone_changes", int(np.count_nonzero(self.broadphase.keys != keys)))
+            self.candidates += len(i)
+            self.collisions += self.collide(i, j)
+            if profiler:
+                profiler.lap("collide", start)
+        self.list_builds = sum(neighbours.builds for neighbours in lists) - builds
+        if profiler:
+            profiler.count("pair_tests", self.candidates)
+            profiler.count("collisions", self.collisions)
+            profiler.count("list_builds", self.list_builds)
+        self.steps += 1
+        if self.resync and self.steps % self.resync == 0:
+            self.recomputeKE()
+
+
+# Creates a world of randomly placed particles with random velocities like the pygame simulations
+def randomWorld(count, box, mass=20, speed=10, friction=1, radius_factor=1/3, margin=None, seed=None, broadphase=None):
+    rng = np.random.default_rng(seed)
+    box = np.asarray(box, dtype=np.float64)
+    margin = mass if margin is None else margin
+    pos = rng.uniform(margin, box - margin, (count, len(box)))
+    vel = rng.uniform(-speed, speed, (count, len(box)))
+    return World(mass, pos, vel, box, friction, radius_factor, broadphase, rng=rng)
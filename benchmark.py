@@ -0,0 +1,276 @@
+##### IMPORTS #####
+import argparse, json, platform, subprocess, time
+import numpy as np
+from Broadphase import CellGrid, SweepAndPrune, withinRadius, withinBox
+from World import randomWorld
+from Particle import randomParticles, stepParticles
+from PairPotential import PairPotential
+
+
+
+
+
+
+##### FUNCTIONS #####
+# Returns particle positions spread evenly over the box like a gas
+def uniformPositions(rng, count, box, radius):
+    return rng.uniform(radius, np.asarray(box) - radius, (count, len(box)))
+
+# Returns particle positions packed into a small blob like the gas after "attract" or heavy friction
+def clusteredPositions(rng, count, box, radius):
+    box = np.asarray(box, dtype=np.float64)
+    pos = rng.normal(box / 2, 6 * radius * count ** (1 / (2 * len(box))), (count, len(box)))
+    return np.clip(pos, radius, box - radius)
+
+# Returns the box and grid cells grown so count particles have the same density as base particles in the original box
+def scaledBox(box, cells, count, base):
+    factor = (count / base) ** (1 / len(box))
+    box = np.asarray(box, dtype=np.float64) * factor
+    cells = np.maximum(1, np.round(np.asarray(cells) * factor)).astype(np.int64)
+    return box, cells
+
+# Times how long a broad phase takes to find candidate pairs over several slightly perturbed frames
+def timeBroadphase(broadphase, pos, radius, rng, frames):
+    pos = pos.copy()
+    broadphase.pairs(pos, radius)
+    start = time.perf_counter()
+    candidates = 0
+    for _ in range(frames):
+        pos += rng.uniform(-1, 1, pos.shape)
+        i, j = broadphase.pairs(pos, radius)
+        candidates += len(i)
+    elapsed = time.perf_counter() - start
+    return elapsed / frames, candidates / frames
+
+# Compares the uniform grid against sweep and prune on evenly spread and clustered particles
+# When base is given the box grows with the particle count to keep the density of base particles in the original box
+def benchBroadphase(counts, box, cells, radius, frames=10, seed=0, base=None):
+    results = []
+    for layout, make in (("uniform", uniformPositions), ("clustered", clusteredPositions)):
+        for count in counts:
+            rng = np.random.default_rng(seed)
+            size, grid_cells = scaledBox(box, cells, count, base) if base else (box, cells)
+            pos = make(rng, count, size, radius)
+            radii = np.full(count, radius)
+            for name, broadphase in (("grid", CellGrid(size, grid_cells)), ("sweep", SweepAndPrune())):
+                seconds, candidates = timeBroadphase(broadphase, pos, radii, rng, frames)
+                results.append({"layout": layout, "count": count, "broadphase": name, "seconds": seconds, "candidates": candidates})
+    return results
+
+# The box, mass, and cell count of the 2D and 3D pygame simulations, and the number of particles they start with
+VIEWERS = {
+    2: {"box": (800, 800), "mass": 20, "radius_factor": 1/3, "margin": 20, "count": 1000, "cells": (100, 100)},
+    3: {"box": (600, 400, 400), "mass": 20, "radius_factor": 1/2, "margin": 10, "count": 500, "cells": (30, 20, 20)},
+}
+
+# Creates a world like the 2D or 3D pygame simulation with count particles, growing the box to keep the same density unless fixed_box
+def viewerWorld(dim, count, seed=0, fixed_box=False):
+    viewer = VIEWERS[dim]
+    box = viewer["box"] if fixed_box else scaledBox(viewer["box"], np.ones(dim), count, viewer["count"])[0]
+    return randomWorld(count, box, viewer["mass"], 10, 0.995, viewer["radius_factor"], viewer["margin"], seed)
+
+# Creates particle objects and their zones like the 2D or 3D pygame simulation with count particles, the same way as viewerWorld
+def viewerParticles(dim, count, seed=0):
+    viewer = VIEWERS[dim]
+    box = scaledBox(viewer["box"], np.ones(dim), count, viewer["count"])[0]
+    particles, zones = randomParticles(count, box, viewer["mass"], 10, viewer["radius_factor"], viewer["margin"], seed)
+    return particles, zones, box
+
+# Times stepping the particle objects one at a time like the original simulations and counts the pair tests and collisions
+def benchObjects(counts, dims=(2, 3), steps=10, seed=0, dt=1):
+    results = []
+    for dim in dims:
+        for count in counts:
+            particles, zones, box = viewerParticles(dim, count, seed)
+            stepParticles(particles, zones, box, 0.995, dt)
+            candidates = collisions = 0
+            start = time.perf_counter()
+            for _ in range(steps):
+                tests, hits, _ = stepParticles(particles, zones, box, 0.995, dt)
+                candidates += tests
+                collisions += hits
+            elapsed = time.perf_counter() - start
+            results.append({"dim": dim, "count": count, "steps": steps, "seconds": elapsed / steps,
+                            "steps_per_sec": steps / elapsed if elapsed > 0 else float("inf"),
+                            "candidates": candidates / steps, "collisions": collisions / steps, "substeps": 1})
+    return results
+
+# Times stepping the 2D and 3D worlds and counts the candidate pairs and actual collisions in each step
+# With a potential ("soft" or "lj") the worlds also feel that pair potential like the viewers with --potential,
+# and the rebuilds of its neighbour list are counted as well
+def benchStepping(counts, dims=(2, 3), steps=10, seed=0, dt=1, potential=None):
+    results = []
+    for dim in dims:
+        for count in counts:
+            world = viewerWorld(dim, count, seed)
+            if potential:
+                world.forces.append(PairPotential(potential))
+                world.hard = potential != "soft"
+            # The first step builds the broad phase and is left out of the timing
+            world.step(dt)
+            candidates = collisions = substeps = builds = 0
+            start = time.perf_counter()
+            for _ in range(steps):
+                world.step(dt)
+                candidates += world.candidates
+                collisions += world.collisions
+                substeps += world.substeps
+                builds += world.list_builds
+            elapsed = time.perf_counter() - start
+            results.append({"dim": dim, "count": count, "steps": steps, "seconds": elapsed / steps,
+                            "steps_per_sec": steps / elapsed if elapsed > 0 else float("inf"),
+                            "candidates": candidates / steps, "collisions": collisions / steps, "substeps": substeps / steps,
+                            "list_builds": builds / steps})
+    return results
+
+# Steps the 2D and 3D worlds on the grids of the viewers and checks after every step that random radius and box queries
+# find exactly the particles a search through every particle finds, timing both
+# Raises a RuntimeError naming the query when one misses or adds a particle, which is checked even when Python runs with -O
+def benchQueries(counts, dims=(2, 3), steps=10, queries=50, seed=0, dt=1):
+    results = []
+    for dim in dims:
+        viewer = VIEWERS[dim]
+        for count in counts:
+            world = viewerWorld(dim, count, seed)
+            world.broadphase = CellGrid(*scaledBox(viewer["box"], viewer["cells"], count, viewer["count"]))
+            rng = np.random.default_rng(seed)
+            grid_time = full_time = found = 0
+            for step in range(steps):
+                world.step(dt)
+                for _ in range(queries):
+                    center = rng.uniform(0, world.box)
+                    radius = rng.uniform(0, 250)
+                    start = time.perf_counter()
+                    near = np.sort(world.queryRadius(center, radius))
+                    inside = np.sort(world.queryBox(center - radius, center + radius))
+                    middle = time.perf_counter()
+                    expected_near = withinRadius(world.pos, center, radius)
+                    expected_inside = withinBox(world.pos, center - radius, center + radius)
+                    full_time += time.perf_counter() - middle
+                    grid_time += middle - start
+                    if not np.array_equal(near, expected_near):
+                        raise RuntimeError(f"queryRadius({center}, {radius}) after step {step} of {count} particles in {dim}D found the wrong particles")
+                    if not np.array_equal(inside, expected_inside):
+                        raise RuntimeError(f"queryBox around {center} after step {step} of {count} particles in {dim}D found the wrong particles")
+                    found += len(near)
+            total = steps * queries
+            results.append({"dim": dim, "count": count, "queries": total, "grid_seconds": grid_time / total,
+                            "full_seconds": full_time / total, "found": found / total})
+    return results
+
+# Times drawing every particle of the 2D and 3D simulations the same way the viewers do onto an offscreen 800 x 800 surface
+# The particles are placed in the viewers' own boxes so the frames look like the viewers with more particles
+def benchRendering(counts, dims=(2, 3), frames=10, seed=0):
+    # PyGame is only needed for rendering so the other benchmarks can run without it
+    import pygame
+    from Renderer import SpriteRenderer
+    from Camera import Camera
+    import particles, particles3D
+    screen = pygame.Surface((800, 800))
+    results = []
+    for dim in dims:
+        for count in counts:
+            world = viewerWorld(dim, count, seed, fixed_box=True)
+            if dim == 2:
+                renderer = SpriteRenderer(3000)
+                draw = lambda: particles.drawParticles(screen, renderer, world)
+            else:
+                renderer = SpriteRenderer(800)
+                camera = Camera(world.box)
+                camera.setAngles(0.3, 0.5)
+                draw = lambda: particles3D.drawParticles(screen, renderer, world, camera)
+            # The first frame renders the sprites and is left out of the timing
+            draw()
+            start = time.perf_counter()
+            for _ in range(frames):
+                screen.fill((0, 0, 0))
+                draw()
+            elapsed = time.perf_counter() - start
+            results.append({"dim": dim, "count": count, "frames": frames, "seconds": elapsed / frames,
+                            "fps": frames / elapsed if elapsed > 0 else float("inf")})
+    return results
+
+# Returns the commit being benchmarked and the versions it ran with so results from different commits can be compared
+def describeRun(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "args": vars(args)}
+
+# Prints benchmark results as a table
+def printResults(results):
+    print(f"{'layout':<10} {'count':>8} {'broadphase':<10} {'ms/step':>10} {'candidates':>12}")
+    for r in results:
+        print(f"{r['layout']:<10} {r['count']:>8} {r['broadphase']:<10} {1000 * r['seconds']:>10.2f} {int(r['candidates']):>12}")
+
+# Prints stepping benchmark results as a table
+def printStepping(results):
+    print(f"{'dim':>3} {'count':>8} {'steps/sec':>10} {'ms/step':>10} {'candidates':>12} {'collisions':>12} {'substeps':>9} {'builds':>7}")
+    for r in results:
+        print(f"{r['dim']:>3} {r['count']:>8} {r['steps_per_sec']:>10.2f} {1000 * r['seconds']:>10.2f} {int(r['candidates']):>12} {r['collisions']:>12.1f} "
+              f"{r['substeps']:>9.2f} {r.get('list_builds', 0):>7.2f}")
+
+# Prints query benchmark results as a table
+def printQueries(results):
+    print(f"{'dim':>3} {'count':>8} {'queries':>8} {'grid ms':>10} {'full ms':>10} {'found':>8}")
+    for r in results:
+        print(f"{r['dim']:>3} {r['count']:>8} {r['queries']:>8} {1000 * r['grid_seconds']:>10.3f} {1000 * r['full_seconds']:>10.3f} {r['found']:>8.1f}")
+
+# Prints rendering benchmark results as a table
+def printRendering(results):
+    print(f"{'dim':>3} {'count':>8} {'ms/frame':>10} {'fps':>8}")
+    for r in results:
+        print(f"{r['dim']:>3} {r['count']:>8} {1000 * r['seconds']:>10.2f} {r['fps']:>8.1f}")
+
+# Parses command line arguments and runs the broad phase, stepping, object, query, or rendering benchmarks (or all of them)
+# Results are printed as tables and can also be written to a JSON file to compare runs across commits
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the particle simulation.")
+    parser.add_argument("-n", "--counts", type=int, nargs="+", default=[1000, 10000, 100000], help="particle counts to benchmark")
+    parser.add_argument("-b", "--box", type=float, nargs="+", default=[800, 800], help="box size, two values for 2D or three for 3D")
+    parser.add_argument("-c", "--cells", type=int, nargs="+", default=None, help="number of grid cells along each axis")
+    parser.add_argument("--frames", type=int, default=10, help="frames to average over")
+    parser.add_argument("--fixed-box", action="store_true", help="keep the box size fixed instead of growing it with the particle count")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the particle positions")
+    parser.add_argument("--suite", choices=["broadphase", "stepping", "objects", "queries", "rendering", "all"], default="broadphase", help="which benchmark to run")
+    parser.add_argument("--dims", type=int, nargs="+", choices=[2, 3], default=[2, 3], help="dimensions of the stepping and rendering benchmarks")
+    parser.add_argument("--steps", type=int, default=10, help="steps to average over in the stepping benchmark")
+    parser.add_argument("--potential", choices=["soft", "lj"], default=None, help="pair potential for the worlds of the stepping benchmark")
+    parser.add_argument("--json", default=None, help="file to write the results to as JSON")
+    args = parser.parse_args(argv)
+    dim = len(args.box)
+    radius = 20 / 3 if dim == 2 else 10
+    cells = args.cells or ([100, 100] if dim == 2 else [30, 20, 20])
+
+    results = {}
+    if args.suite in ("broadphase", "all"):
+        base = None if args.fixed_box else (1000 if dim == 2 else 500)
+        results["broadphase"] = benchBroadphase(args.counts, args.box, cells, radius, args.frames, args.seed, base)
+        printResults(results["broadphase"])
+    if args.suite in ("stepping", "all"):
+        results["stepping"] = benchStepping(args.counts, args.dims, args.steps, args.seed, potential=args.potential)
+        printStepping(results["stepping"])
+    if args.suite in ("objects", "all"):
+        results["objects"] = benchObjects(args.counts, args.dims, args.steps, args.seed)
+        printStepping(results["objects"])
+    if args.suite in ("queries", "all"):
+        results["queries"] = benchQueries(args.counts, args.dims, args.steps, seed=args.seed)
+        printQueries(results["queries"])
+    if args.suite in ("rendering", "all"):
+        results["rendering"] = benchRendering(args.counts, args.dims, args.frames, args.seed)
+        printRendering(results["rendering"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"run": describeRun(args), "results": results}, f, indent=2)
+    return results
+
+
+
+
+
+
+##### MAIN #####
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+##### IMPORTS #####
+import argparse, time
+import numpy as np
+from World import randomWorld
+from Broadphase import SweepAndPrune
+from EventWorld import EventWorld
+from ParallelWorld import ParallelWorld
+from Checkpoint import loadCheckpoint, saveCheckpoint
+from Recorder import Recorder
+from BarnesHut import BarnesHut
+from PairPotential import PairPotential
+
+
+
+
+
+
+##### FUNCTIONS #####
+# Creates a world of particles sized and placed the same way as the 2D or 3D pygame simulation
+# broadphase is "grid" for cells as wide as a particle or "sweep" for sweep and prune
+# engine is "step" for fixed steps, "event" for exact event driven collisions, or "parallel" for steps split across processes
+# When a checkpoint file is given the particles are restored from it instead
+# forces are force models like BarnesHut or PairPotential and hard turns collisions between particles on or off,
+# which only the "step" engine supports
+def makeWorld(count, box, friction, mass=20, seed=None, broadphase="grid", engine="step", workers=None, checkpoint=None, forces=(), hard=True):
+    sweep = SweepAndPrune() if broadphase == "sweep" else None
+    if checkpoint is not None:
+        world, _ = loadCheckpoint(checkpoint, broadphase=sweep)
+    elif len(box) == 2:
+        world = randomWorld(count, box, mass, 10, friction, 1/3, margin=mass, seed=seed, broadphase=sweep)
+    else:
+        world = randomWorld(count, box, mass, 10, friction, 1/2, margin=mass / 2, seed=seed, broadphase=sweep)
+    world.forces = list(forces)
+    world.hard = hard
+    if engine == "event":
+        return EventWorld.fromWorld(world)
+    if engine == "parallel":
+        return ParallelWorld.fromWorld(world, workers)
+    return world
+
+# Returns a dictionary of energy statistics for the current state of the world
+def energyStats(world):
+    ke = world.ke()
+    return {
+        "total_ke": float(ke.sum()),
+        "mean_ke": float(ke.mean()),
+        "max_ke": float(ke.max()),
+        "mean_speed": float(np.sqrt(2 * ke / world.mass).mean()),
+    }
+
+# Runs a simulation for a number of steps without any display and reports its speed and final energy
+# The simulation can start from a checkpoint file with load and its final state can be saved to one with save
+# When record is given every record_every-th step is streamed to that trajectory file with positions and velocities stored as record_dtype
+def runHeadless(count=1000, box=(800, 800), friction=0.995, steps=1000, mass=20, seed=None, broadphase="grid", engine="step", workers=None, dt=1,
+                load=None, save=None, record=None, record_every=1, record_dtype="float32", forces=(), hard=True):
+    world = makeWorld(count, box, friction, mass, seed, broadphase, engine, workers, load, forces, hard)
+    start_ke = world.totalKE()
+    recorder = Recorder(record, world, record_dtype, record_every) if record is not None else None
+
+    start = time.perf_counter()
+    if recorder:
+        recorder.record(world)
+    for _ in range(steps):
+        world.step(dt)
+        if recorder:
+            recorder.record(world)
+    if recorder:
+        recorder.close()
+    elapsed = time.perf_counter() - start
+
+    stats = energyStats(world)
+    stats["count"] = len(world)
+    stats["dim"] = world.pos.shape[1]
+    if save is not None:
+        saveCheckpoint(world, save)
+    # Worker processes are stopped once the final state has been measured
+    if engine == "parallel":
+        world.close()
+    stats["start_ke"] = start_ke
+    stats["steps"] = steps
+    stats["time"] = steps * dt
+    stats["seconds"] = elapsed
+    stats["steps_per_sec"] = steps / elapsed if elapsed > 0 else float("inf")
+    return world, stats
+
+# Parses command line arguments, runs the simulation, and prints a summary
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the particle simulation without a display.")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="number of particles")
+    parser.add_argument("-s", "--steps", type=int, default=1000, help="number of steps to simulate")
+    parser.add_argument("-b", "--box", type=float, nargs="+", default=[800, 800], help="box size, two values for 2D or three for 3D")
+    parser.add_argument("--dt", type=float, default=1, help="simulated time per step, which is split into substeps for fast particles")
+    parser.add_argument("-f", "--friction", type=float, default=0.995, help="fraction of velocity kept after each collision")
+    parser.add_argument("-m", "--mass", type=float, default=20, help="mass of every particle")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the initial conditions")
+    parser.add_argument("--broadphase", choices=["grid", "sweep"], default="grid", help="method used to find colliding pairs")
+    parser.add_argument("--engine", choices=["step", "event", "parallel"], default="step", help="fixed steps, exact event driven collisions, or steps split across processes")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes for the parallel engine (defaults to one per core)")
+    parser.add_argument("--load", default=None, help="checkpoint file to start from instead of random particles")
+    parser.add_argument("--save", default=None, help="checkpoint file to save the final state to")
+    parser.add_argument("--record", default=None, help="trajectory file to stream the positions and velocities of every step to")
+    parser.add_argument("--record-every", type=int, default=1, help="only record every k-th step")
+    parser.add_argument("--record-dtype", choices=["float16", "float32", "float64"], default="float32", help="precision of the recorded positions and velocities")
+    parser.add_argument("-g", "--gravity", type=float, default=0, help="strength of a Barnes-Hut long range force between all particles (negative repels)")
+    parser.add_argument("--theta", type=float, default=0.5, help="opening angle of the Barnes-Hut tree (smaller is more accurate)")
+    parser.add_argument("--potential", choices=["soft", "lj"], default=None, help="short range pair potential (soft spheres replace hard collisions)")
+    parser.add_argument("--epsilon", type=float, default=None, help="strength of the pair potential")
+    parser.add_argument("--skin", type=float, default=None, help="skin distance of the Verlet neighbour list of the pair potential (sized from the speed of the particles by default)")
+    args = parser.parse_args(argv)
+    if len(args.box) not in (2, 3):
+        parser.error("--box takes two values for 2D or three values for 3D")
+    if (args.gravity or args.potential) and args.engine != "step":
+        parser.error("--gravity and --potential only work with the step engine")
+    forces = [BarnesHut(args.gravity, args.theta)] if args.gravity else []
+    if args.potential:
+        forces.append(PairPotential(args.potential, args.epsilon, skin=args.skin))
+
+    _, stats = runHeadless(args.count, args.box, args.friction, args.steps, args.mass, args.seed, args.broadphase, args.engine, args.workers, args.dt,
+                           args.load, args.save, args.record, args.record_every, args.record_dtype, forces,
+                           args.potential != "soft")
+    print(f"{stats['count']} particles in {stats['dim']}D, {stats['steps']} steps in {stats['seconds']:.3f}s ({stats['steps_per_sec']:.1f} steps/sec)")
+    print(f"Total kinetic energy: {stats['start_ke']:.1f} -> {stats['total_ke']:.1f}")
+    print(f"Mean kinetic energy: {stats['mean_ke']:.2f}    |    Max kinetic energy: {stats['max_ke']:.2f}    |    Mean speed: {stats['mean_speed']:.3f}")
+    return stats
+
+
+
+
+
+
+##### MAIN #####
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,11 @@
 ##### IMPORTS #####
-import pygame, sys, random, math
+import pygame, sys
 from pygame.locals import *
-from Vector import Vector
-from Particle import Particle
-
-
-
-
-
-
-##### INITIALIZATION #####
-# Global simulation constants
-width = 800
-height = 800
-rows = 100
-cols = 100
-friction = 0.995
-mass = 20
-
-# PyGame Initialization
-pygame.init()
-screen = pygame.display.set_mode((width + 650, height))
-clock = pygame.time.Clock()
-
-# Simulation variables
-particles = []
-zones = [[set() for _ in range(cols)] for _ in range(rows)]
-clicking = False
-space_pressed = False
-click_opacity = 0
-click_size = 0
-
-# Create particles
-for i in range(1000):
-    pos = Vector([random.randint(mass, width - mass), random.randint(mass, height - mass)])
-    vel = Vector([random.uniform(-10, 10), random.uniform(-10, 10)])
-    p = Particle(mass, pos, vel, height // rows, width // cols, zones)
-    particles.append(p)
-
-# Graph variables
-total_ke = sum([p.ke() for p in particles])
-ke_graph = [total_ke for _ in range(141)]
+from Renderer import SpriteRenderer
+from Hud import Hud, niceCeil
+from Histogram import Histogram
+from History import History
+from Viewer import viewerParser, parseViewerArgs, makeViewerSim, makeViewerProfiler
 
 
 
@@ -48,73 +13,36 @@ ke_graph = [total_ke for _ in range(141)]
 
 
 ##### FUNCTIONS #####
-# Increases the velocity of all particles within a certain radius of the click
-def handleClick(particles, pos):
-    vec = Vector([pos[0], pos[1]])
-    for p in particles:
-        if p.pos.dist(vec) < 70:
-            p.vel += p.vel.norm().scale(6)
-
-def handleSpace(particles, pos):
-    vec = Vector([pos[0], pos[1]])
-    for p in particles:
-        scalar = (80 / (p.pos - vec).mag())
-        p.vel -= (p.pos - vec).norm().scale(min(300, scalar))
+# Draws every particle with a color from blue (low energy) to red (high energy)
+def drawParticles(screen, renderer, world):
+    renderer.draw(screen, world.pos[:, 0], world.pos[:, 1], world.radius, world.ke())
 
 # Draws a graph of the total kinetic energy of the system over time
-def drawGraph(screen, ke_graph, startX, width, height):
-    drawText(screen, "KINETIC ENERGY OVER TIME", startX + width - 25, height // 2, (200, 200, 200), 16, -90)
-
-    # Find the current maximum value of the kinetic energy graph
-    m = max(ke_graph)
-    # Draw the grid lines and scale values
-    for i in range(11):
-        y = (height - 25) - ((height - 50) * i // 10)
-        val = m * i / 10
-        drawText(screen, getExpText(int(val)), startX + 20, y, "white")
-        x1 = startX + 40
-        x2 = startX + width - 50
-        pygame.draw.line(screen, (42, 42, 42), (x1, y), (x2, y), 1)
-
-    # Set the previous point to start drawing line segments
-    y = (height - 25) - ((height - 50) * ke_graph[0] / m)
-    x = startX + 40
-    prev = (x, y)
+def drawGraph(screen, hud, ke_graph, startX, width, height):
+    # Round the current maximum of the kinetic energy graph up so the grid only has to be redrawn when the scale changes
+    m = niceCeil(float(ke_graph.max()))
+    # Draw the cached grid lines and scale values
+    labels = [getExpText(int(m * i / 10)) for i in range(11)]
+    screen.blit(hud.grid("KINETIC ENERGY OVER TIME", labels, width, height), (startX, 0))
+
     # Create a graph by drawing lines between points in the kinetic energy graph
-    for i, ke in enumerate(ke_graph):
-        y = (height - 25) - ((height - 50) * ke / m)
-        x = startX + 40 + (i * 4)
-        pygame.draw.line(screen, "purple", prev, (x, y), 2)
-        prev = (x, y)
-
-def drawDist(screen, particles, startX, startY, width, height):
-    drawText(screen, "MAXWELL-BOLTZMANN DISTRIBUTION", startX + width - 25, startY + height // 2, (200, 200, 200), 16, -90)
-
-    hist_size = ((width // 1) - 1)
-    hist = [0 for _ in range(10000)]
-    for p in particles:
-        i = int(hist_size * p.vel.mag() // 39)
-        hist[i] += 1
-    max_h = 50 * ((height - 50) * max(hist) / len(particles))
+    points = [(startX + 40 + (i * 4), (height - 25) - ((height - 50) * ke / m)) for i, ke in enumerate(ke_graph.tolist())]
+    pygame.draw.lines(screen, "purple", False, points, 2)
+
+def drawDist(screen, hud, hist, world, startX, startY, width, height):
+    # Find the fraction of particles in each velocity bin (one bin per pixel column)
+    fractions = hist.update(world.vel)
+    max_h = 50 * ((height - 50) * fractions.max())
     scale = 1 if max_h < (height - 50) else (height - 50) / max_h
+    # Round the top of the scale up so the grid only has to be redrawn when the scale changes
+    if scale < 1:
+        scale = 2 / niceCeil(2 / scale)
+
+    labels = [str(round(2 * i / (10 * scale), 1)) + "%" for i in range(11)]
+    screen.blit(hud.grid("MAXWELL-BOLTZMANN DISTRIBUTION", labels, width, height), (startX, startY))
 
-    for i in range(11):
-        y =  startY + (height - 25) - ((height - 50) * i // 10)
-        val = 2 * i / (10 * scale)
-        drawText(screen, str(round(val, 1)) + "%", startX + 20, y, "white")
-        x1 = startX + 40
-        x2 = startX + width - 50
-        pygame.draw.line(screen, (42, 42, 42), (x1, y), (x2, y), 1)
-    
-    for i, h in enumerate(hist):
-        x = startX + 50 + (i*1)
-        val = scale * 50 * ((height - 50) * h / len(particles))
-        y = startY + height - 20 - val
-        color = pygame.Color(255, 255, 255)
-        lum = 50
-        hue = max(0, 220 - (scale * 220 * i // 350))
-        color.hsla = (hue, 100, min(100, lum), 100)
-        pygame.draw.rect(screen, color, (x, y, 1, val))
+    # Draw the histogram bars
+    hist.draw(screen, startX + 50, startY + height - 20, scale * 50 * (height - 50), height - 50, scale)
 
 # Returns a string of the value in exponential form (1230 --> 1.2e3, 627 --> 627)
 def getExpText(val):
@@ -128,15 +56,6 @@ def getExpText(val):
         text = f"{val}e{exp}"
     return text
 
-# Draws text to the screen at a certain location
-def drawText(screen, text, x, y, color, size=11, angle=0):
-    font = pygame.font.SysFont("Arial", size)
-    text_surface = font.render(text, True, color)
-    text_surface =  pygame.transform.rotate(text_surface, angle)
-    text_rect = text_surface.get_rect()
-    text_rect.center = (x, y)
-    screen.blit(text_surface, text_rect)
-
 def drawClick(screen, opacity, size):
     color = pygame.Color(150, 150, 150)
     h, s, l, a = color.hsla
@@ -149,68 +68,152 @@ def drawClick(screen, opacity, size):
 
 
 
-##### MAIN LOOP #####
-while True:
-    click_opacity -= 10
-    if click_opacity < 0:
-        click_opacity = 0
-        click_size = 0
-    ke_graph.pop(0)
-    ke_graph.append(sum([p.ke() for p in particles]))
-    # Event handler loop
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            pygame.quit()
-            sys.exit()
-        if event.type == MOUSEBUTTONDOWN:
-            clicking = True
-        if event.type == MOUSEBUTTONUP:
-            clicking = False
-            # click_size = 0
-        if event.type == KEYDOWN and event.key == K_SPACE:
-            space_pressed = True
-        if event.type == KEYUP and event.key == K_SPACE:
-            space_pressed = False
-    if clicking and space_pressed:
-        handleSpace(particles, pygame.mouse.get_pos())
-        click_opacity = 50
-        click_size = min(click_size + 20, 70)
-    elif clicking:
-        handleClick(particles, pygame.mouse.get_pos())
-        click_opacity = 50
-        click_size = min(click_size + 20, 70)
-    
-    # Fills the background with black
-    screen.fill((0, 0, 0))
-    drawClick(screen, click_opacity, click_size)
-    drawGraph(screen, ke_graph, width, 650, height // 2)
-    drawDist(screen, particles, width, 400, 650, height // 2)
-    pygame.draw.line(screen, (150, 150, 150), (width, height // 2), (width + 650, height // 2), 2)
-    pygame.draw.line(screen, (150, 150, 150), (width, 0), (width, height), 2)
-    pygame.draw.rect(screen, (150, 150, 150), (0, 0, width + 650, height), 2)
-
-    # Update and draw particles and handle collisions and wall collisions
-    for i in range(len(particles)):
-        # Update the current particle
-        particles[i].update(width, height, friction)
-        # Current particle's zone
-        zone = particles[i].zone
-        # Set of already done collisions to avoid duplicates
-        collisions = set()
-        # Check collisions with other particles in nearby zones
-        for zrow in range(zone[0] - 1, zone[0] + 2):
-            for zcol in range(zone[1] - 1, zone[1] + 2):
-                if 0 <= zrow < rows and 0 <= zcol < cols:
-                    for p in zones[zrow][zcol]:
-                        # Check that this collision has not already been done and
-                        # that we are not colliding with ourself
-                        if particles[i] != p and (p, particles[i]) not in collisions:
-                            particles[i].collide(p, friction)
-                            collisions.add((particles[i], p))
-        # Draw the particle
-        particles[i].draw(screen)
-    
-    # Update the display and set the caption to the total kinetic energy of the system
-    pygame.display.update()
-    pygame.display.set_caption(f"Total Kinetic Energy: {getExpText(int(sum([p.ke() for p in particles])))}    |    FPS: {int(clock.get_fps())}")
-    clock.tick(500)
+if __name__ == "__main__":
+    ##### INITIALIZATION #####
+    # Command line options
+    parser = viewerParser("2D particle simulation.")
+    parser.add_argument("--attract-radius", type=float, default=None, help="only pull the particles within this distance of the mouse when attracting (all particles by default)")
+    args = parseViewerArgs(parser)
+
+    # Global simulation constants
+    width = 800
+    height = 800
+    rows = 100
+    cols = 100
+    friction = 0.995
+    mass = 20
+
+    # PyGame Initialization
+    pygame.init()
+    screen = pygame.display.set_mode((width + 650, height))
+    clock = pygame.time.Clock()
+    hud = Hud(args.panel_fps)
+    # One histogram bin per pixel column of the distribution plot, with the same speed per column as before
+    hist = Histogram(550, 39 / 649, 220, 350, args.hist_every, args.hist_sample)
+    # Only the parts of the window that changed are sent to the display
+    sim_rect = pygame.Rect(0, 0, width, height)
+    panel_rect = pygame.Rect(width, 0, 650, height)
+
+    # Simulation variables
+    clicking = False
+    space_pressed = False
+    click_opacity = 0
+    click_size = 0
+
+    renderer = SpriteRenderer(3000)
+    # Play back a recorded trajectory, or step random particles (or ones restored with their kinetic energy history from a checkpoint)
+    sim, ke_graph = makeViewerSim(parser, args, (width, height), (cols, rows), 1000, mass, 10, friction, 1/3, mass)
+
+    # Graph variables
+    if ke_graph is None:
+        ke_graph = History(141, fill=sim.latest(0).totalKE())
+
+    # Timing of each phase of the frame
+    profiler = makeViewerProfiler(args, sim)
+    show_profile = args.profile
+
+
+
+
+
+
+    ##### MAIN LOOP #####
+    while True:
+        if profiler:
+            start = profiler.now()
+        click_opacity -= 10
+        if click_opacity < 0:
+            click_opacity = 0
+            click_size = 0
+        # Event handler loop
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                sim.close()
+                profiler.close()
+                pygame.quit()
+                sys.exit()
+            if event.type == MOUSEBUTTONDOWN:
+                clicking = True
+            if event.type == MOUSEBUTTONUP:
+                clicking = False
+                # click_size = 0
+            if event.type == KEYDOWN and event.key == K_SPACE:
+                space_pressed = True
+            if event.type == KEYUP and event.key == K_SPACE:
+                space_pressed = False
+            # Save a checkpoint of the simulation and its kinetic energy history
+            if event.type == KEYDOWN and event.key == K_s:
+                sim.send("save", args.save, ke_graph)
+            # Skip back or forward by a second of playback when replaying
+            if event.type == KEYDOWN and event.key in (K_LEFT, K_RIGHT) and args.replay:
+                sim.seek(sim.index() + (1 if event.key == K_RIGHT else -1) * abs(args.replay_fps))
+            # Show or hide the timing overlay (timing starts or stops with the next frame)
+            if event.type == KEYDOWN and event.key == K_p:
+                show_profile = not show_profile
+        # The tool under the mouse is applied once per simulation step for as long as it is held
+        if clicking:
+            if space_pressed:
+                sim.hold("space", pygame.mouse.get_pos(), args.attract_radius)
+            else:
+                sim.hold("click", pygame.mouse.get_pos())
+            click_opacity = 50
+            click_size = min(click_size + 20, 70)
+        else:
+            sim.hold(None)
+
+        if profiler:
+            start = profiler.lap("events", start)
+
+        # Update all particles and handle collisions and wall collisions (or get the latest frame from the physics process)
+        view = sim.latest(clock.get_time() / 1000)
+        ke_graph.append(view.totalKE())
+        if profiler:
+            start = profiler.lap("physics", start)
+
+        # Fills the simulation view with black and keeps anything drawn in it off of the panels between panel updates
+        screen.set_clip(sim_rect)
+        screen.fill((0, 0, 0))
+        drawClick(screen, click_opacity, click_size)
+        dirty = [sim_rect]
+
+        # Redraw the graphs and the caption at the lower panel rate
+        screen.set_clip(None)
+        refresh = hud.due(clock.get_time() / 1000)
+        if refresh:
+            if profiler:
+                start = profiler.now()
+            drawGraph(screen, hud, ke_graph.values(), width, 650, height // 2)
+            if profiler:
+                start = profiler.lap("graph", start)
+            drawDist(screen, hud, hist, view, width, 400, 650, height // 2)
+            if profiler:
+                profiler.lap("dist", start)
+            dirty.append(panel_rect)
+            caption = f"Total Kinetic Energy: {getExpText(int(view.totalKE()))}    |    FPS: {int(clock.get_fps())}"
+            if args.process:
+                caption += f"    |    Physics: {int(view.rate)} steps/s"
+            if args.replay:
+                caption += f"    |    Frame: {sim.index()} / {len(sim.trajectory)}"
+            pygame.display.set_caption(caption)
+        pygame.draw.line(screen, (150, 150, 150), (width, height // 2), (width + 650, height // 2), 2)
+        pygame.draw.line(screen, (150, 150, 150), (width, 0), (width, height), 2)
+        pygame.draw.rect(screen, (150, 150, 150), (0, 0, width + 650, height), 2)
+
+        # Draw the particles
+        if profiler:
+            start = profiler.now()
+        screen.set_clip(sim_rect)
+        drawParticles(screen, renderer, view)
+        if show_profile:
+            profiler.draw(screen, hud, refresh)
+        screen.set_clip(None)
+        if profiler:
+            start = profiler.lap("draw", start)
+
+        # Update the parts of the display that changed
+        pygame.display.update(dirty)
+        if profiler:
+            profiler.lap("display", start)
+            profiler.endFrame()
+        profiler.enabled = show_profile or args.profile_csv is not None
+        clock.tick(500)